@@ -1,23 +1,138 @@
 import time
+import uasyncio
+
+# Conversions take up to 80 ms per the datasheet but usually finish sooner:
+# poll the busy bit from _FIRST_POLL_MS, doubling the delay up to _MAX_POLL_MS,
+# and give up on a conversion after _TIMEOUT_MS
+_FIRST_POLL_MS = 40
+_POLL_MS = 5
+_MAX_POLL_MS = 20
+_TIMEOUT_MS = 150
+
+
+def _crc8(data, n):
+    # CRC-8, polynomial 0x31, initial value 0xFF
+    crc = 0xFF
+    for i in range(n):
+        crc ^= data[i]
+        for _ in range(8):
+            if crc & 0x80:
+                crc = ((crc << 1) ^ 0x31) & 0xFF
+            else:
+                crc = (crc << 1) & 0xFF
+    return crc
+
+
 class AHT20:
-    def __init__(self, i2c, address=0x38):
+    # crc: validate the checksum byte of every frame
+    # retries: extra conversions attempted after a timeout or bad frame
+    # reset: False skips the init sequence when the sensor still reports
+    # itself calibrated, e.g. on a warm boot (see devices.DeviceRegistry)
+    def __init__(self, i2c, address=0x38, crc=False, retries=2, reset=True):
         self.i2c = i2c
         self.address = address
-        time.sleep_ms(20)
-        self.i2c.writeto(self.address, b'\xBE')  # soft reset
-        time.sleep_ms(20)
-        self._trigger_measure()
+        self.crc = crc
+        self.retries = retries
+        self._buf = bytearray(7)
+        self._status = bytearray(1)
+        if reset or not self._calibrated():
+            time.sleep_ms(20)
+            self.i2c.writeto(self.address, b'\xBE')  # soft reset
+            time.sleep_ms(20)
+            self._trigger_measure()
 
-    def _trigger_measure(self):
+    def _trigger(self):
         self.i2c.writeto(self.address, b'\xAC\x33\x00')
-        time.sleep_ms(80)
-        data = self.i2c.readfrom(self.address, 7)
+
+    def _calibrated(self):
+        self.i2c.readfrom_into(self.address, self._status)
+        return self._status[0] & 0x08
+
+    def _busy(self):
+        self.i2c.readfrom_into(self.address, self._status)
+        return self._status[0] & 0x80
+
+    def _wait(self):
+        # True once the conversion finished, False on timeout
+        time.sleep_ms(_FIRST_POLL_MS)
+        waited = _FIRST_POLL_MS
+        delay = _POLL_MS
+        while self._busy():
+            if waited >= _TIMEOUT_MS:
+                return False
+            time.sleep_ms(delay)
+            waited += delay
+            delay = min(delay * 2, _MAX_POLL_MS)
+        return True
+
+    async def _wait_async(self):
+        await uasyncio.sleep_ms(_FIRST_POLL_MS)
+        waited = _FIRST_POLL_MS
+        delay = _POLL_MS
+        while self._busy():
+            if waited >= _TIMEOUT_MS:
+                return False
+            await uasyncio.sleep_ms(delay)
+            waited += delay
+            delay = min(delay * 2, _MAX_POLL_MS)
+        return True
+
+    def _collect(self):
+        # Read and decode a frame; returns an error message or None
+        data = self._buf
+        self.i2c.readfrom_into(self.address, data)
         if data[0] & 0x80:
-            raise Exception("AHT20 not ready")
+            return "AHT20 not ready"
+        if self.crc and _crc8(data, 6) != data[6]:
+            return "AHT20 CRC mismatch"
         raw_temp = ((data[3] & 0x0F) << 16) | (data[4] << 8) | data[5]
         raw_hum = (data[1] << 12) | (data[2] << 4) | (data[3] >> 4)
         self._humidity = (raw_hum / (1 << 20)) * 100
         self._temperature = (raw_temp / (1 << 20)) * 200 - 50
+        return None
+
+    def _trigger_measure(self):
+        error = "AHT20 not ready"
+        for _ in range(self.retries + 1):
+            self._trigger()
+            if not self._wait():
+                continue
+            error = self._collect()
+            if error is None:
+                return self._temperature, self._humidity
+        raise Exception(error)
+
+    # Split-phase API for sensors.SensorScheduler: trigger() starts a
+    # conversion and returns the ms to wait before polling ready(), then
+    # collect() returns (temperature degC, relative humidity %)
+    def trigger(self):
+        self._trigger()
+        return _FIRST_POLL_MS
+
+    def ready(self):
+        return not self._busy()
+
+    def collect(self):
+        error = self._collect()
+        if error is not None:
+            raise Exception(error)
+        return self._temperature, self._humidity
+
+    def measure(self):
+        # One conversion; returns (temperature degC, relative humidity %)
+        return self._trigger_measure()
+
+    async def measure_async(self):
+        # Same as measure(), but lets other tasks run during the conversion
+        error = "AHT20 not ready"
+        for _ in range(self.retries + 1):
+            self._trigger()
+            if not await self._wait_async():
+                continue
+            error = self._collect()
+            if error is None:
+                return self._temperature, self._humidity
+        raise Exception(error)
 
     @property
     def temperature(self):
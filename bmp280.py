@@ -1,13 +1,97 @@
 import time
 import struct
 
+# ctrl_meas (0xF4) oversampling settings for temperature and pressure
+OSAMPLE_SKIP = 0
+OSAMPLE_1 = 1
+OSAMPLE_2 = 2
+OSAMPLE_4 = 3
+OSAMPLE_8 = 4
+OSAMPLE_16 = 5
+
+# config (0xF5) IIR filter coefficient
+FILTER_OFF = 0
+FILTER_2 = 1
+FILTER_4 = 2
+FILTER_8 = 3
+FILTER_16 = 4
+
+# config (0xF5) standby time between conversions in normal mode
+STANDBY_0_5 = 0
+STANDBY_62_5 = 1
+STANDBY_125 = 2
+STANDBY_250 = 3
+STANDBY_500 = 4
+STANDBY_1000 = 5
+STANDBY_2000 = 6
+STANDBY_4000 = 7
+
+# ctrl_meas power modes
+MODE_SLEEP = 0
+MODE_FORCED = 1
+MODE_NORMAL = 3
+
+_REG_STATUS = 0xF3
+_REG_CTRL_MEAS = 0xF4
+_REG_CONFIG = 0xF5
+_REG_DATA = 0xF7
+
+_STATUS_MEASURING = 0x08
+
+_STANDBY_MS = (0.5, 62.5, 125, 250, 500, 1000, 2000, 4000)
+
+
 class BMP280:
-    def __init__(self, i2c, addr=0x76):
+    def __init__(self, i2c, addr=0x76, temp_os=OSAMPLE_1, press_os=OSAMPLE_1,
+                 filter=FILTER_OFF, standby=STANDBY_1000, mode=MODE_NORMAL, calibration=None):
+        # calibration: the 24-byte block at 0x88 saved from an earlier boot
+        # (see devices.DeviceRegistry), skips reading it from the sensor
         self.i2c = i2c
         self.addr = addr
-        self._load_calibration()
-        self.i2c.writeto_mem(self.addr, 0xF4, b'\x27')  # normal mode
-        self.i2c.writeto_mem(self.addr, 0xF5, b'\xA0')  # config
+        self._data = bytearray(6)
+        self._reg = bytearray(1)
+        self._cached = None
+        self._cached_at = 0
+        self._load_calibration(calibration)
+        self.configure(temp_os, press_os, filter, standby, mode)
+
+    def configure(self, temp_os=None, press_os=None, filter=None, standby=None, mode=None):
+        # Change any subset of the sampling settings. The config register is
+        # only reliably written in sleep mode, so the sensor is put to sleep
+        # first and the requested mode is written last.
+        if temp_os is not None:
+            self.temp_os = temp_os
+        if press_os is not None:
+            self.press_os = press_os
+        if filter is not None:
+            self.filter = filter
+        if standby is not None:
+            self.standby = standby
+        if mode is not None:
+            self.mode = mode
+        self._write(_REG_CTRL_MEAS, MODE_SLEEP)
+        self._write(_REG_CONFIG, (self.standby << 5) | (self.filter << 2))
+        self._write(_REG_CTRL_MEAS, self._ctrl_meas(self.mode))
+        self._cached = None
+
+    def _ctrl_meas(self, mode):
+        return (self.temp_os << 5) | (self.press_os << 2) | mode
+
+    def _write(self, reg, value):
+        self._reg[0] = value
+        self.i2c.writeto_mem(self.addr, reg, self._reg)
+
+    @property
+    def measurement_ms(self):
+        # Maximum conversion time for the current oversampling, per datasheet
+        t = (1 << (self.temp_os - 1)) if self.temp_os else 0
+        p = (1 << (self.press_os - 1)) if self.press_os else 0
+        return 1.25 + 2.3 * t + (2.3 * p + 0.575 if p else 0)
+
+    @property
+    def period_ms(self):
+        # Time between fresh results in normal mode
+        return self.measurement_ms + _STANDBY_MS[self.standby]
 
     def _read16(self, reg):
         d = self.i2c.readfrom_mem(self.addr, reg, 2)
@@ -23,8 +107,10 @@ class BMP280:
         d = self.i2c.readfrom_mem(self.addr, reg, 3)
         return (d[0] << 16) | (d[1] << 8) | d[2]
 
-    def _load_calibration(self):
-        calib = self.i2c.readfrom_mem(self.addr, 0x88, 24)
+    def _load_calibration(self, calib=None):
+        if calib is None or len(calib) != 24:
+            calib = self.i2c.readfrom_mem(self.addr, 0x88, 24)
+        self.calibration = bytes(calib)
         self.dig_T1 = struct.unpack_from("<H", calib, 0)[0]
         self.dig_T2 = struct.unpack_from("<h", calib, 2)[0]
         self.dig_T3 = struct.unpack_from("<h", calib, 4)[0]
@@ -37,18 +123,100 @@ class BMP280:
         self.dig_P7 = struct.unpack_from("<h", calib, 18)[0]
         self.dig_P8 = struct.unpack_from("<h", calib, 20)[0]
         self.dig_P9 = struct.unpack_from("<h", calib, 22)[0]
+        self._precompute()
+
+    def _precompute(self):
+        # Calibration-derived terms, computed once so each sample only does
+        # small-int and float arithmetic (datasheet section 8.1, floating point)
+        t1, t2, t3 = self.dig_T1, self.dig_T2, self.dig_T3
+        self._kt1 = t2 / 16384.0
+        self._kt2 = t1 / 1024.0 * t2
+        self._kt3 = 1 / 131072.0
+        self._kt4 = t1 / 8192.0
+        self._kt5 = float(t3)
+        self._kp1 = self.dig_P1 / 32768.0
+        self._kp2 = self.dig_P2 / 524288.0
+        self._kp3 = self.dig_P3 / 524288.0 / 524288.0
+        self._kp4 = self.dig_P4 * 65536.0
+        self._kp5 = self.dig_P5 * 2.0
+        self._kp6 = self.dig_P6 / 32768.0
+        self._kp7 = self.dig_P7 / 16.0
+        self._kp8 = self.dig_P8 / 32768.0 / 16.0
+        self._kp9 = self.dig_P9 / 2147483648.0 / 16.0
+        self._kp1f = float(self.dig_P1)
+        # Constant parts of the 64-bit integer reference
+        self._t1x2 = t1 << 1
+        self._p4_35 = self.dig_P4 << 35
+        self._p7_4 = self.dig_P7 << 4
 
     def _read_raw_data(self):
-        data = self.i2c.readfrom_mem(self.addr, 0xF7, 6)
+        # One 6-byte burst covering both pressure and temperature
+        data = self._data
+        self.i2c.readfrom_mem_into(self.addr, _REG_DATA, data)
         adc_p = (data[0] << 12) | (data[1] << 4) | (data[2] >> 4)
         adc_t = (data[3] << 12) | (data[4] << 4) | (data[5] >> 4)
         return adc_t, adc_p
 
+    # Split-phase API for sensors.SensorScheduler: trigger() starts a
+    # conversion (forced mode only) and returns the ms to wait before polling
+    # ready(), then collect() returns (temperature degC, pressure Pa)
+    def trigger(self):
+        if self.mode != MODE_FORCED:
+            return 0
+        self._write(_REG_CTRL_MEAS, self._ctrl_meas(MODE_FORCED))
+        return int(self.measurement_ms) + 1
+
+    def ready(self):
+        if self.mode != MODE_FORCED:
+            return True
+        self.i2c.readfrom_mem_into(self.addr, _REG_STATUS, self._reg)
+        return not self._reg[0] & _STATUS_MEASURING
+
+    def collect(self):
+        self._cached = self._compensate_float(*self._read_raw_data())
+        self._cached_at = time.ticks_ms()
+        return self._cached
+
+    def _force(self):
+        # Start a single conversion and wait for it to finish
+        time.sleep_ms(self.trigger())
+        while not self.ready():
+            time.sleep_ms(1)
+
+    def read(self):
+        # (temperature degC, pressure Pa) from a single burst. In normal mode
+        # the result is reused until the sensor can have produced a new one.
+        if self.mode == MODE_NORMAL:
+            now = time.ticks_ms()
+            if self._cached is not None and time.ticks_diff(now, self._cached_at) < self.period_ms:
+                return self._cached
+        elif self.mode == MODE_FORCED:
+            self._force()
+        return self.collect()
+
     def read_compensated_data(self):
-        adc_t, adc_p = self._read_raw_data()
+        # Datasheet 64-bit integer reference; read() uses the float path
+        return self._compensate(*self._read_raw_data())
+
+    def _compensate_float(self, adc_t, adc_p):
+        # Temperature compensation
+        x = adc_t * self._kt3 - self._kt4
+        t_fine = adc_t * self._kt1 - self._kt2 + x * x * self._kt5
+        temp = t_fine / 5120.0
+
+        # Pressure compensation
+        var1 = t_fine * 0.5 - 64000.0
+        var2 = (var1 * var1 * self._kp6 + var1 * self._kp5) * 0.25 + self._kp4
+        var1 = self._kp1f + (var1 * var1 * self._kp3 + var1 * self._kp2) * self._kp1
+        if var1 == 0:
+            return temp, 0.0
+        p = ((1048576 - adc_p) - var2 / 4096.0) * 6250.0 / var1
+        p += p * p * self._kp9 + p * self._kp8 + self._kp7
+        return temp, p
 
+    def _compensate(self, adc_t, adc_p):
         # Temperature compensation
-        var1 = ((((adc_t >> 3) - (self.dig_T1 << 1))) * self.dig_T2) >> 11
+        var1 = ((((adc_t >> 3) - self._t1x2)) * self.dig_T2) >> 11
         var2 = (((((adc_t >> 4) - self.dig_T1) * ((adc_t >> 4) - self.dig_T1)) >> 12) * self.dig_T3) >> 14
         t_fine = var1 + var2
         temp = (t_fine * 5 + 128) >> 8
@@ -57,7 +225,7 @@ class BMP280:
         var1 = t_fine - 128000
         var2 = var1 * var1 * self.dig_P6
         var2 = var2 + ((var1 * self.dig_P5) << 17)
-        var2 = var2 + (self.dig_P4 << 35)
+        var2 = var2 + self._p4_35
         var1 = ((var1 * var1 * self.dig_P3) >> 8) + ((var1 * self.dig_P2) << 12)
         var1 = (((1 << 47) + var1) * self.dig_P1) >> 33
 
@@ -68,16 +236,16 @@ class BMP280:
             p = (((p << 31) - var2) * 3125) // var1
             var1 = (self.dig_P9 * (p >> 13) * (p >> 13)) >> 25
             var2 = (self.dig_P8 * p) >> 19
-            pressure = ((p + var1 + var2) >> 8) + (self.dig_P7 << 4)
+            pressure = ((p + var1 + var2) >> 8) + self._p7_4
 
         return temp / 100.0, pressure / 256.0
 
     @property
     def temperature(self):
-        t, _ = self.read_compensated_data()
+        t, _ = self.read()
         return t
 
     @property
     def pressure(self):
-        _, p = self.read_compensated_data()
+        _, p = self.read()
         return p
@@ -0,0 +1,94 @@
+# buttons.py - debounced button gestures delivered to a uasyncio task
+#
+# The pin IRQ only sets a ThreadSafeFlag (a preallocated bound method, so
+# nothing is allocated in the handler). A task then samples every button
+# each debounce period until all are released, so bounces within a period
+# collapse into one edge. A gesture runs from the first press to the last
+# release and is named after the buttons involved, e.g. "wake" or
+# "wake+mode" for a chord; it fires LONG once held for long_ms, otherwise
+# PRESS on release.
+import time
+
+import uasyncio
+from machine import Pin
+
+PRESS = "press"
+LONG = "long"
+
+
+class Buttons:
+    def __init__(self, debounce_ms=30, long_ms=800):
+        self.debounce_ms = debounce_ms
+        self.long_ms = long_ms
+        self._flag = uasyncio.ThreadSafeFlag()
+        self._irq = self._edge  # bind once; the IRQ must not allocate
+        self._pins = []
+        self._names = []
+        self._active = []  # pin level when pressed
+        self._handlers = {}
+        self.busy = False  # a gesture is in progress
+
+    def add(self, pin, name, active_low=True):
+        # Watch a pin number (pulled up when active low) as button `name`
+        if isinstance(pin, int):
+            pin = Pin(pin, Pin.IN, Pin.PULL_UP if active_low else Pin.PULL_DOWN)
+        self._pins.append(pin)
+        self._names.append(name)
+        self._active.append(0 if active_low else 1)
+        pin.irq(trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING, handler=self._irq)
+        return pin
+
+    def on(self, name, event, callback):
+        # Call callback() when gesture `name` fires PRESS or LONG
+        self._handlers[(name, event)] = callback
+
+    def _edge(self, pin):
+        self._flag.set()
+
+    def poke(self):
+        # Sample the buttons now, e.g. after a wake from light sleep, which
+        # does not deliver the edge IRQ
+        self._flag.set()
+
+    def _held(self):
+        # Bit mask of buttons currently down
+        mask = 0
+        for i in range(len(self._pins)):
+            if self._pins[i].value() == self._active[i]:
+                mask |= 1 << i
+        return mask
+
+    def _gesture(self, mask):
+        return "+".join(self._names[i] for i in range(len(self._names)) if mask & (1 << i))
+
+    def _fire(self, mask, event):
+        handler = self._handlers.get((self._gesture(mask), event))
+        if handler is not None:
+            try:
+                handler()
+            except Exception as e:
+                print("Button handler error:", e)
+
+    async def run(self):
+        while True:
+            await self._flag.wait()
+            # Let the contacts settle before the first sample
+            await uasyncio.sleep_ms(self.debounce_ms)
+            held = self._held()
+            if not held:
+                continue
+            self.busy = True
+            started = time.ticks_ms()
+            gesture = held
+            long_fired = False
+            while held:
+                if not long_fired and time.ticks_diff(time.ticks_ms(), started) >= self.long_ms:
+                    long_fired = True
+                    self._fire(gesture, LONG)
+                await uasyncio.sleep_ms(self.debounce_ms)
+                held = self._held()
+                gesture |= held
+            if not long_fired:
+                self._fire(gesture, PRESS)
+            self.busy = False
+            self._flag.clear()  # edges from the release itself
@@ -0,0 +1,231 @@
+# compositor.py - retained-mode screen model with dirty-rectangle flushing
+import framebuf
+
+from st7735 import draw_text, swap565
+
+# Rectangles are composed in bands that fit a strip of this many full rows;
+# narrower rectangles get proportionally taller bands
+_BAND_H = 8
+
+# Fills a Number whose value does not fit its cells
+OVERFLOW = "#"
+
+
+def _overlaps(ax, ay, aw, ah, bx, by, bw, bh):
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+
+class RawBackground:
+    # Reads sub-rectangles of a flat big-endian RGB565 image straight from
+    # flash, one row at a time, so nothing larger than a band is allocated.
+    def __init__(self, path, width):
+        self.path = path
+        self.width = width
+        # Fail here rather than on the first flush if the file is missing
+        open(path, "rb").close()
+
+    def background_rect(self, x, y, w, h, buf):
+        row_bytes = w * 2
+        mv = memoryview(buf)
+        with open(self.path, "rb") as f:
+            for row in range(h):
+                f.seek(((y + row) * self.width + x) * 2)
+                f.readinto(mv[row * row_bytes:(row + 1) * row_bytes])
+
+
+class Label:
+    # One line of 8x8 text; each character occupies one 8px cell.
+    # `font` is an 8x8 bitmap font such as vga1_8x8, None for the built-in.
+    def __init__(self, x, y, text="", color=0xFFFF, font=None):
+        self.x = x
+        self.y = y
+        self.text = text
+        self.color = color
+        self.font = font
+        self._shown = None  # text currently on the panel, None = never drawn
+        self._shown_color = color
+
+    def set(self, text, color=None):
+        self.text = text
+        if color is not None:
+            self.color = color
+
+    def bounds(self):
+        return self.x, self.y, len(self.text) * 8, 8
+
+    def changed(self):
+        # True if the next flush would repaint this widget
+        return self._shown != self.text or self._shown_color != self.color
+
+    def invalidate(self):
+        self._shown = None
+
+    def dirty_rects(self):
+        # Runs of cells whose character changed since the last flush
+        new = self.text
+        old = self._shown
+        if old == new and self._shown_color == self.color:
+            return ()
+        if old is None or self._shown_color != self.color:
+            n = max(len(new), len(old) if old else 0)
+            rects = ((self.x, self.y, n * 8, 8),) if n else ()
+        else:
+            rects = []
+            start = -1
+            n = max(len(new), len(old))
+            for i in range(n + 1):
+                changed = i < n and (new[i:i + 1] or " ") != (old[i:i + 1] or " ")
+                if changed and start < 0:
+                    start = i
+                elif not changed and start >= 0:
+                    rects.append((self.x + start * 8, self.y, (i - start) * 8, 8))
+                    start = -1
+        self._shown = new
+        self._shown_color = self.color
+        return rects
+
+    def draw(self, fb, ox, oy):
+        draw_text(fb, self.font, self.text, self.x - ox, self.y - oy, swap565(self.color))
+
+
+class Number(Label):
+    # Large digits in `cells` fixed-width cells of 8 * scale pixels, right
+    # aligned. Each cell whose character changed is repainted on its own.
+    def __init__(self, x, y, cells, scale=2, color=0xFFFF, font=None):
+        super().__init__(x, y, "", color, font)
+        self.cells = cells
+        self.scale = scale
+        self.text = " " * cells
+
+    def set(self, text, color=None):
+        # Text longer than the cells shows OVERFLOW rather than a truncation
+        # that would read as a different value
+        if len(text) > self.cells:
+            text = OVERFLOW * self.cells
+        elif len(text) < self.cells:
+            text = " " * (self.cells - len(text)) + text
+        super().set(text, color)
+
+    def set_value(self, value, decimals, color=None):
+        # Show a number with up to `decimals` places, dropping places until
+        # it fits: in 5 cells -12.5 stays "-12.5" but -100.04 becomes "-100"
+        for d in range(decimals, -1, -1):
+            text = "{:.{}f}".format(value, d)
+            if len(text) <= self.cells:
+                break
+        self.set(text, color)
+
+    def bounds(self):
+        size = 8 * self.scale
+        return self.x, self.y, self.cells * size, size
+
+    def dirty_rects(self):
+        new = self.text
+        old = self._shown
+        if old == new and self._shown_color == self.color:
+            return ()
+        size = 8 * self.scale
+        every = old is None or self._shown_color != self.color
+        rects = [(self.x + i * size, self.y, size, size)
+                 for i in range(self.cells) if every or old[i] != new[i]]
+        self._shown = new
+        self._shown_color = self.color
+        return rects
+
+    def draw(self, fb, ox, oy):
+        draw_text(fb, self.font, self.text, self.x - ox, self.y - oy, swap565(self.color), self.scale)
+
+
+class Compositor:
+    def __init__(self, tft, background):
+        self.tft = tft
+        self.background = background
+        self.widgets = []
+        self._damage = []
+        self._strip = bytearray(tft.width * _BAND_H * 2)
+        self.bytes_sent = 0
+
+    def add(self, widget):
+        self.widgets.append(widget)
+        return widget
+
+    def invalidate(self, x=0, y=0, w=None, h=None):
+        # Mark a region for repaint; no arguments means the whole screen
+        if w is None:
+            w = self.tft.width - x
+        if h is None:
+            h = self.tft.height - y
+        self._damage.append((x, y, w, h))
+        if x == 0 and y == 0 and w >= self.tft.width and h >= self.tft.height:
+            for widget in self.widgets:
+                widget.invalidate()
+
+    def pending(self):
+        # True if a flush would send anything
+        if self._damage:
+            return True
+        for widget in self.widgets:
+            if widget.changed():
+                return True
+        return False
+
+    def flush(self):
+        # Push every dirty region to the panel; returns the pixel bytes sent
+        sent = 0
+        for x, y, w, h in self._collect():
+            for buf, bx, by, bw, bh in self._bands(x, y, w, h):
+                self.tft.blit_buffer(buf, bx, by, bw, bh)
+                sent += len(buf)
+        self.bytes_sent += sent
+        return sent
+
+    async def flush_async(self):
+        # Same as flush(), yielding to the event loop while bands go out
+        sent = 0
+        for x, y, w, h in self._collect():
+            for buf, bx, by, bw, bh in self._bands(x, y, w, h):
+                await self.tft.blit_buffer_async(buf, bx, by, bw, bh)
+                sent += len(buf)
+        self.bytes_sent += sent
+        return sent
+
+    def _collect(self):
+        rects = self._damage
+        self._damage = []
+        full = None
+        for r in rects:
+            if r[2] >= self.tft.width and r[3] >= self.tft.height:
+                full = r
+        if full:
+            rects = [full]
+            for widget in self.widgets:
+                widget.dirty_rects()
+        else:
+            for widget in self.widgets:
+                rects.extend(widget.dirty_rects())
+        return rects
+
+    def _bands(self, x, y, w, h):
+        # Compose a rectangle band by band, yielding each ready buffer
+        tft = self.tft
+        if x < 0:
+            w += x
+            x = 0
+        if y < 0:
+            h += y
+            y = 0
+        w = min(w, tft.width - x)
+        h = min(h, tft.height - y)
+        if w <= 0 or h <= 0:
+            return
+        band = max(1, len(self._strip) // (w * 2))
+        for by in range(y, y + h, band):
+            bh = min(band, y + h - by)
+            n = w * bh * 2
+            buf = memoryview(self._strip)[:n]
+            self.background.background_rect(x, by, w, bh, buf)
+            fb = framebuf.FrameBuffer(buf, w, bh, framebuf.RGB565)
+            for widget in self.widgets:
+                if _overlaps(x, by, w, bh, *widget.bounds()):
+                    widget.draw(fb, x, by)
+            yield buf, x, by, w, bh
@@ -0,0 +1,104 @@
+# derived.py - dew point, heat index, absolute humidity and pressure tendency
+#
+# Fed one sample record at a time (see sensors.SensorScheduler) and adds its
+# outputs to the same record, so the display, the logs and any API see them
+# next to the raw channels:
+#   "dew_point" degC, "heat_index" degC, "abs_humidity" g/m3,
+#   "pressure_tendency" Pa change over the window (3 h by default)
+# The tendency keeps one mean per bucket in a fixed ring covering the window;
+# a sample only touches the open bucket, so every update is O(1) and the
+# history is never rescanned.
+import math
+from array import array
+
+# Magnus coefficients (Sonntag 1990), good from -45 to 60 degC
+_A = 17.62
+_B = 243.12
+
+# WMO-style tendency: a change under this many Pa over the window is steady
+STEADY_PA = 100
+
+
+def _heat_index_f(t, rh):
+    # NWS heat index in degF: Steadman's simple fit, Rothfusz regression
+    # (with its low/high humidity adjustments) once that reaches 80F
+    hi = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+    if (hi + t) / 2 < 80:
+        return hi
+    hi = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+          - 6.83783e-3 * t * t - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh
+          + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+    if rh < 13 and 80 <= t <= 112:
+        hi -= (13 - rh) / 4 * math.sqrt((17 - abs(t - 95)) / 17)
+    elif rh > 85 and 80 <= t <= 87:
+        hi += (rh - 85) / 10 * (87 - t) / 5
+    return hi
+
+
+class DerivedMetrics:
+    # window/bucket: tendency span and the resolution it is tracked at
+    def __init__(self, window=10800, bucket=600):
+        self.bucket = bucket
+        self.slots = window // bucket
+        self._means = array("f", bytearray(4 * self.slots))
+        self._ids = array("i", [-1] * self.slots)  # bucket number per slot
+        self._id = -1  # open bucket
+        self._sum = 0.0
+        self._n = 0
+        self.dew_point = None
+        self.heat_index = None
+        self.abs_humidity = None
+        self.pressure_tendency = None
+
+    def update(self, record):
+        # Derive from a sample record and add the results to it
+        t = record.get("temperature")
+        rh = record.get("humidity")
+        if t is None or rh is None or rh <= 0:
+            self.dew_point = self.heat_index = self.abs_humidity = None
+        else:
+            g = _A * t / (_B + t)
+            # Saturation vapour pressure (hPa) shared by both humidity terms
+            es = 6.112 * math.exp(g)
+            self.abs_humidity = es * rh * 2.1674 / (273.15 + t)
+            g += math.log(rh / 100)
+            self.dew_point = _B * g / (_A - g)
+            self.heat_index = (_heat_index_f(t * 9 / 5 + 32, rh) - 32) * 5 / 9
+        self._pressure(int(record["time"]), record.get("pressure"))
+        record["dew_point"] = self.dew_point
+        record["heat_index"] = self.heat_index
+        record["abs_humidity"] = self.abs_humidity
+        record["pressure_tendency"] = self.pressure_tendency
+        return record
+
+    def _pressure(self, t, p):
+        bid = t // self.bucket
+        if bid != self._id:
+            if self._n:
+                i = self._id % self.slots
+                self._means[i] = self._sum / self._n
+                self._ids[i] = self._id
+            self._id = bid
+            self._sum = 0.0
+            self._n = 0
+        if p is not None:
+            self._sum += p
+            self._n += 1
+        # Compare the open bucket with the one a full window earlier, which
+        # shares its ring slot until the open bucket is committed
+        i = bid % self.slots
+        if self._n and self._ids[i] == bid - self.slots:
+            self.pressure_tendency = self._sum / self._n - self._means[i]
+        else:
+            self.pressure_tendency = None
+
+    def trend(self):
+        # "rising", "falling", "steady" or None before a full window
+        d = self.pressure_tendency
+        if d is None:
+            return None
+        if d >= STEADY_PA:
+            return "rising"
+        if d <= -STEADY_PA:
+            return "falling"
+        return "steady"
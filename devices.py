@@ -0,0 +1,93 @@
+# devices.py - one I2C scan at boot, cached for the next one
+#
+# The first boot scans the bus once, matches the addresses against the
+# drivers below and saves the result, with the BMP280 calibration block, to
+# a small JSON file. Later boots check each cached device with a single read
+# and go straight to initialisation; if a check fails the bus is scanned
+# again and the file rewritten. Delete the file to pick up a newly fitted
+# sensor.
+import binascii
+
+import ujson
+
+# Address -> device kind; the first address found wins for each kind
+KNOWN = {0x38: "aht20", 0x76: "bmp280", 0x77: "bmp280"}
+
+_BMP280_ID_REG = 0xD0
+_BMP280_ID = 0x58
+
+
+class DeviceRegistry:
+    def __init__(self, i2c, path="i2c_devices.json"):
+        self.i2c = i2c
+        self.path = path
+        self.devices = {}  # kind -> address
+        self._calibration = {}  # kind -> hex string
+        self.warm = False  # True when the cache was used
+        self._changed = False
+
+    def detect(self):
+        # Returns {kind: address} for every known device on the bus
+        self.warm = self._load() and self._verify()
+        if not self.warm:
+            self._scan()
+        return self.devices
+
+    def address(self, kind):
+        return self.devices.get(kind)
+
+    def calibration(self, kind):
+        # Saved calibration bytes for a device, or None
+        data = self._calibration.get(kind)
+        return binascii.unhexlify(data) if data else None
+
+    def set_calibration(self, kind, data):
+        data = binascii.hexlify(data).decode()
+        if self._calibration.get(kind) != data:
+            self._calibration[kind] = data
+            self._changed = True
+
+    def save(self):
+        # Write the topology if anything changed since it was loaded
+        if not self._changed:
+            return
+        try:
+            with open(self.path, "w") as f:
+                ujson.dump({"devices": self.devices, "calibration": self._calibration}, f)
+            self._changed = False
+        except OSError as e:
+            print("Device cache write error:", e)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                cfg = ujson.load(f)
+            self.devices = cfg["devices"]
+            self._calibration = cfg.get("calibration", {})
+            return bool(self.devices)
+        except Exception:
+            return False
+
+    def _verify(self):
+        # One read per cached device: it must answer, and a BMP280 must
+        # still report its chip ID at that address
+        try:
+            for kind, addr in self.devices.items():
+                if kind == "bmp280":
+                    if self.i2c.readfrom_mem(addr, _BMP280_ID_REG, 1)[0] != _BMP280_ID:
+                        return False
+                else:
+                    self.i2c.readfrom(addr, 1)
+        except OSError:
+            return False
+        return True
+
+    def _scan(self):
+        self.devices = {}
+        self._calibration = {}
+        for addr in self.i2c.scan():
+            kind = KNOWN.get(addr)
+            if kind and kind not in self.devices:
+                self.devices[kind] = addr
+        self._changed = True
+        print("I2C devices:", ", ".join("{} 0x{:02X}".format(k, a) for k, a in self.devices.items()) or "none")
@@ -0,0 +1,133 @@
+# filters.py - per-channel streaming filters between the sensors and consumers
+#
+# Each channel of a sample record runs through a chain of stages in order;
+# every stage keeps its state in arrays sized at construction, so filtering
+# a sample does no per-sample allocation beyond the result floats. A None
+# input (failed read) passes through without touching the state; an outlier
+# stage replaces a rejected reading with the last accepted one, so a single
+# spike neither reaches the consumers nor reads as a failed sensor.
+#
+# Chains are read from a JSON file mapping channels to stage lists:
+#   {"temperature": [{"type": "calibrate", "offset": -0.4},
+#                    {"type": "median", "n": 5},
+#                    {"type": "ema", "alpha": 0.3}],
+#    "pressure": [{"type": "outlier", "limit": 300}]}
+from array import array
+
+import ujson
+
+
+class Calibrate:
+    # v * scale + offset
+    def __init__(self, offset=0.0, scale=1.0):
+        self.offset = offset
+        self.scale = scale
+
+    def process(self, v):
+        return v * self.scale + self.offset
+
+
+class EMA:
+    # Exponential moving average; alpha in (0, 1], larger follows faster
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self._state = array("f", (0.0,))
+        self._primed = False
+
+    def process(self, v):
+        if not self._primed:
+            self._primed = True
+            self._state[0] = v
+        else:
+            self._state[0] += self.alpha * (v - self._state[0])
+        return self._state[0]
+
+
+class Median:
+    # Median of the last n readings (of those seen so far until n arrive)
+    def __init__(self, n=5):
+        self.n = n
+        self._ring = array("f", bytearray(4 * n))
+        self._sorted = array("f", bytearray(4 * n))
+        self._head = 0
+        self._count = 0
+
+    def process(self, v):
+        ring = self._ring
+        ring[self._head] = v
+        self._head = (self._head + 1) % self.n
+        if self._count < self.n:
+            self._count += 1
+        # Insertion sort into the scratch array; n is small
+        s = self._sorted
+        k = self._count
+        for i in range(k):
+            x = ring[i]
+            j = i
+            while j and s[j - 1] > x:
+                s[j] = s[j - 1]
+                j -= 1
+            s[j] = x
+        if k & 1:
+            return s[k >> 1]
+        return (s[(k >> 1) - 1] + s[k >> 1]) / 2
+
+
+class Outlier:
+    # Reject a reading more than `limit` from the last accepted one; after
+    # `hold` rejections in a row the new level is accepted as a real step.
+    # A rejected reading is replaced by the last accepted value; `rejects`
+    # counts them.
+    def __init__(self, limit, hold=3):
+        self.limit = limit
+        self.hold = hold
+        self.rejects = 0
+        self._last = array("f", (0.0,))
+        self._primed = False
+        self._rejected = 0
+
+    def process(self, v):
+        if self._primed and abs(v - self._last[0]) > self.limit and self._rejected < self.hold:
+            self._rejected += 1
+            self.rejects += 1
+            return self._last[0]
+        self._primed = True
+        self._rejected = 0
+        self._last[0] = v
+        return v
+
+
+STAGES = {"calibrate": Calibrate, "ema": EMA, "median": Median, "outlier": Outlier}
+
+
+class Pipeline:
+    # chains: {channel: [stage, ...]}
+    def __init__(self, chains=None):
+        self.chains = [(channel, tuple(stages)) for channel, stages in (chains or {}).items()]
+
+    def apply(self, record):
+        # Filter a sample record in place and return it
+        for channel, stages in self.chains:
+            v = record.get(channel)
+            if v is None:
+                continue
+            for stage in stages:
+                v = stage.process(v)
+            record[channel] = v
+        return record
+
+
+def load(path="filters.json"):
+    # Pipeline from a config file; no file means no filtering
+    try:
+        with open(path) as f:
+            cfg = ujson.load(f)
+    except OSError:
+        return Pipeline()
+    chains = {}
+    for channel, stages in cfg.items():
+        chain = chains[channel] = []
+        for stage in stages:
+            stage = dict(stage)
+            chain.append(STAGES[stage.pop("type")](**stage))
+    return Pipeline(chains)
@@ -0,0 +1,158 @@
+# flashlog.py - append-only binary log of readings in rotating segment files
+#
+# Records are fixed 16-byte structs (time, temperature, humidity, pressure)
+# buffered in RAM and appended in batches, each batch closed by a 16-byte
+# footer holding a marker, the record count and a CRC32 of the batch.
+# Readers only trust records covered by a valid footer, so a write torn by
+# a reset or power loss is skipped rather than misread. Segments are capped
+# in size and the oldest ones are deleted once the segment count is reached.
+import binascii
+import os
+import struct
+import time
+
+_RECORD = "<Ifff"
+_FOOTER = "<IHHI4x"
+_SIZE = 16
+_MARKER = 0xFFFFFFFF
+_VERSION = 1
+
+NAN = float("nan")
+
+
+def _value(record, channel):
+    v = record.get(channel)
+    return NAN if v is None else v
+
+
+class FlashLog:
+    # batch: records buffered before a write; interval: seconds after which
+    # a partial batch is written anyway; segment_bytes/segments: rotation
+    def __init__(self, path="log", batch=10, interval=900, segment_bytes=16384, segments=8):
+        self.path = path
+        self.batch = batch
+        self.interval = interval
+        self.segment_bytes = segment_bytes
+        self.segments = segments
+        self._buf = bytearray(batch * _SIZE)
+        self._count = 0
+        self._first = 0
+        self._footer = bytearray(_SIZE)
+        try:
+            os.mkdir(path)
+        except OSError:
+            pass
+        self._seq, self._size = self._recover()
+
+    def _name(self, seq):
+        return "{}/{:05d}.log".format(self.path, seq)
+
+    def _list(self):
+        # Segment sequence numbers, oldest first
+        seqs = []
+        for name in os.listdir(self.path):
+            if name.endswith(".log"):
+                try:
+                    seqs.append(int(name[:-4]))
+                except ValueError:
+                    pass
+        seqs.sort()
+        return seqs
+
+    def _recover(self):
+        # Current segment and its size; a segment with a torn tail is left
+        # as-is and writing continues in a fresh one
+        seqs = self._list()
+        if not seqs:
+            return 1, 0
+        seq = seqs[-1]
+        size = os.stat(self._name(seq))[6]
+        for _ in self._scan(seq):
+            pass
+        if self._valid != size:
+            return seq + 1, 0
+        return seq, size
+
+    def _scan(self, seq):
+        # Yield (time, temperature, humidity, pressure) for every record in
+        # a complete batch; sets self._valid to the bytes covered by footers
+        self._valid = 0
+        unit = bytearray(_SIZE)
+        pending = bytearray(self.batch * _SIZE)
+        n = 0
+        offset = 0
+        with open(self._name(seq), "rb") as f:
+            while f.readinto(unit) == _SIZE:
+                offset += _SIZE
+                if struct.unpack_from("<I", unit)[0] == _MARKER:
+                    _, count, _, crc = struct.unpack(_FOOTER, unit)
+                    if count == n and binascii.crc32(memoryview(pending)[:n * _SIZE]) == crc:
+                        for i in range(n):
+                            yield struct.unpack_from(_RECORD, pending, i * _SIZE)
+                        self._valid = offset
+                    n = 0
+                elif n < self.batch:
+                    pending[n * _SIZE:(n + 1) * _SIZE] = unit
+                    n += 1
+                else:
+                    n = self.batch + 1  # oversized batch, cannot be valid
+
+    def append(self, record):
+        # Buffer a sample record; writes when the batch is full or old enough
+        t = int(record["time"])
+        if self._count == 0:
+            self._first = time.time()
+        struct.pack_into(_RECORD, self._buf, self._count * _SIZE, t,
+                         _value(record, "temperature"), _value(record, "humidity"),
+                         _value(record, "pressure"))
+        self._count += 1
+        if self._count >= self.batch or time.time() - self._first >= self.interval:
+            self.flush()
+
+    def flush(self):
+        n = self._count
+        if not n:
+            return
+        data = memoryview(self._buf)[:n * _SIZE]
+        struct.pack_into(_FOOTER, self._footer, 0, _MARKER, n, _VERSION, binascii.crc32(data))
+        if self._size and self._size + (n + 1) * _SIZE > self.segment_bytes:
+            self._seq += 1
+            self._size = 0
+        if not self._size:
+            self._prune()
+        with open(self._name(self._seq), "ab") as f:
+            f.write(data)
+            f.write(self._footer)
+        self._size += (n + 1) * _SIZE
+        self._count = 0
+
+    def _prune(self):
+        # Make room for a new segment by deleting the oldest ones
+        seqs = [seq for seq in self._list() if seq != self._seq]
+        while len(seqs) >= self.segments:
+            os.remove(self._name(seqs.pop(0)))
+
+    def restore(self, history):
+        # Replay the newest segment that has records into `history`, keeping
+        # only records between the newest time already in history and now:
+        # stamps from before a clock reset, or from a run whose clock was
+        # ahead, would break History's time order. Returns the number of
+        # records restored.
+        now = time.time()
+        n = 0
+        for seq in reversed(self._list()):
+            prev = history.newest() or 0
+            for t, temp, hum, pres in self._scan(seq):
+                if t < prev or t > now:
+                    continue
+                prev = t
+                history.add({
+                    "time": t,
+                    "temperature": None if temp != temp else temp,
+                    "humidity": None if hum != hum else hum,
+                    "pressure": None if pres != pres else pres,
+                })
+                n += 1
+            if n:
+                break
+        return n
@@ -0,0 +1,132 @@
+# glyphcache.py - LRU cache of pre-rendered RGB565 glyph tiles
+#
+# Tiles are big-endian RGB565, ready to be written to the panel as-is, and
+# live in one fixed pool allocated up front. Keys are
+# (character, foreground, background, scale) for a single font.
+#
+# Set as tft.glyphs it serves text() calls with a solid background color.
+# The compositor does not use it: its widgets are drawn over the background
+# image, which an opaque tile would paint over, so main.py leaves it unset.
+from array import array
+
+import framebuf
+
+_GLYPH = 8
+
+
+class GlyphCache:
+    # `font` is an 8x8 bitmap starting at ' ' (vga1_8x8 or its FONT), or
+    # None for the framebuf built-in font
+    def __init__(self, font=None, slots=32, max_scale=1):
+        self.font = getattr(font, "FONT", font)
+        self.slots = slots
+        self.max_scale = max_scale
+        self._tile = (_GLYPH * max_scale) ** 2 * 2
+        self._pool = bytearray(slots * self._tile)
+        self._keys = [None] * slots
+        self._index = {}
+        self._used = array("I", bytearray(4 * slots))
+        self._clock = 0
+        self._mono = bytearray(_GLYPH)
+        self._mono_fb = framebuf.FrameBuffer(self._mono, _GLYPH, _GLYPH, framebuf.MONO_HLSB)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ch, fg, bg, scale=1):
+        # Returns a memoryview over the tile, (8 * scale) squared pixels
+        if scale > self.max_scale:
+            raise ValueError("scale exceeds max_scale")
+        key = (ch, fg, bg, scale)
+        self._clock += 1
+        slot = self._index.get(key)
+        if slot is None:
+            self.misses += 1
+            slot = self._evict()
+            self._keys[slot] = key
+            self._index[key] = slot
+            self._render(slot, ch, fg, bg, scale)
+        else:
+            self.hits += 1
+        self._used[slot] = self._clock
+        start = slot * self._tile
+        size = _GLYPH * _GLYPH * scale * scale * 2
+        return memoryview(self._pool)[start:start + size]
+
+    def draw(self, tft, text, x, y, fg, bg, scale=1):
+        # Copy the tiles row by row into the driver's text strip and send
+        # them in one window; text wider than the strip goes out in as few
+        # windows as fit
+        size = _GLYPH * scale
+        row = size * 2
+        strip = tft._strip
+        per = len(strip) // (size * row)
+        if not per:
+            raise ValueError("scale too large for the text strip")
+        for first in range(0, len(text), per):
+            part = text[first:first + per]
+            line = len(part) * row
+            for i in range(len(part)):
+                tile = self.get(part[i], fg, bg, scale)
+                out = i * row
+                for r in range(size):
+                    strip[out:out + row] = tile[r * row:(r + 1) * row]
+                    out += line
+            tft.blit_buffer(memoryview(strip)[:line * size], x + first * size, y, len(part) * size, size)
+
+    def _evict(self):
+        # Least recently used slot; empty slots have a stamp of 0
+        used = self._used
+        slot = 0
+        oldest = used[0]
+        for i in range(1, self.slots):
+            if used[i] < oldest:
+                oldest = used[i]
+                slot = i
+        old = self._keys[slot]
+        if old is not None:
+            del self._index[old]
+        return slot
+
+    def _glyph_rows(self, ch):
+        code = ord(ch) - 32
+        if self.font is None:
+            self._mono_fb.fill(0)
+            self._mono_fb.text(ch, 0, 0, 1)
+        elif 0 <= code < len(self.font) // _GLYPH:
+            self._mono[:] = self.font[code * _GLYPH:(code + 1) * _GLYPH]
+        else:
+            self._mono[:] = bytes(_GLYPH)
+        return self._mono
+
+    def _render(self, slot, ch, fg, bg, scale):
+        rows = self._glyph_rows(ch)
+        pool = self._pool
+        size = _GLYPH * scale
+        row_bytes = size * 2
+        out = slot * self._tile
+        fhi = (fg >> 8) & 0xFF
+        flo = fg & 0xFF
+        bhi = (bg >> 8) & 0xFF
+        blo = bg & 0xFF
+        for r in range(_GLYPH):
+            bits = rows[r]
+            start = out
+            for c in range(_GLYPH):
+                lit = bits & (0x80 >> c)
+                for _ in range(scale):
+                    pool[out] = fhi if lit else bhi
+                    pool[out + 1] = flo if lit else blo
+                    out += 2
+            # Repeat the expanded row for vertical scaling
+            for _ in range(scale - 1):
+                pool[out:out + row_bytes] = pool[start:start + row_bytes]
+                out += row_bytes
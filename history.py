@@ -0,0 +1,246 @@
+# history.py - fixed-size in-RAM time series of sensor readings
+#
+# Samples go into a raw ring and are folded into coarser tiers (1 min,
+# 15 min and 1 h by default) as they arrive. Every ring is a set of
+# preallocated arrays, so the footprint is fixed at construction and
+# inserts and queries never create per-sample objects. Missing readings
+# are stored as NaN and skipped by the aggregates.
+from array import array
+
+NAN = float("nan")
+
+_ITEMSIZE = {"f": 4, "I": 4, "H": 2}
+
+# (bucket seconds, buckets kept)
+DEFAULT_TIERS = ((60, 120), (900, 96), (3600, 168))
+
+# A sample up to this many seconds older than the newest one is stored at
+# the newest time (a small clock correction); anything older means the
+# clock was reset and the history is started over
+BACKSTEP_MAX = 60
+
+
+def _zeros(typecode, n):
+    # bytearray (not bytes) initializers are copied raw by MicroPython too
+    return array(typecode, bytearray(_ITEMSIZE[typecode] * n))
+
+
+class _Ring:
+    # Chronological ring of timestamps plus per-channel value arrays
+    def __init__(self, size, fields):
+        self.size = size
+        self.count = 0
+        self.head = 0  # next slot to write
+        self.t = _zeros("I", size)
+        self.fields = [_zeros("f", size) for _ in range(fields)]
+
+    def slot(self, i):
+        # Array index of the i-th oldest entry
+        return (self.head - self.count + i) % self.size
+
+    def push(self, t):
+        # Claim the next slot for time t; returns its index
+        i = self.head
+        self.t[i] = t
+        self.head = (i + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+        return i
+
+    def first_at(self, t):
+        # Logical index of the first entry with time >= t (binary search)
+        lo = 0
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if self.t[self.slot(mid)] < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def nbytes(self):
+        return self.size * 4 * (1 + len(self.fields))
+
+    def clear(self):
+        self.count = 0
+        self.head = 0
+
+
+class _Tier:
+    # Per-bucket min/max/mean/count for each channel; the open bucket is
+    # accumulated in place and committed when a sample crosses into the next
+    def __init__(self, seconds, size, channels):
+        self.seconds = seconds
+        n = channels
+        # fields: min, max, mean for each channel, then sample counts
+        self.ring = _Ring(size, 3 * n + n)
+        self.start = -1
+        self.acc_min = _zeros("f", n)
+        self.acc_max = _zeros("f", n)
+        self.acc_sum = _zeros("f", n)
+        self.acc_n = _zeros("H", n)
+
+    def add(self, t, values):
+        start = t - t % self.seconds
+        if start != self.start:
+            self.commit()
+            self.start = start
+        for c in range(len(values)):
+            v = values[c]
+            if v != v:
+                continue
+            if self.acc_n[c] == 0:
+                self.acc_min[c] = v
+                self.acc_max[c] = v
+                self.acc_sum[c] = v
+            else:
+                if v < self.acc_min[c]:
+                    self.acc_min[c] = v
+                if v > self.acc_max[c]:
+                    self.acc_max[c] = v
+                self.acc_sum[c] += v
+            self.acc_n[c] += 1
+
+    def clear(self):
+        self.ring.clear()
+        self.start = -1
+        for c in range(len(self.acc_n)):
+            self.acc_n[c] = 0
+
+    def commit(self):
+        if self.start < 0:
+            return
+        n = len(self.acc_n)
+        f = self.ring.fields
+        i = self.ring.push(self.start)
+        for c in range(n):
+            k = self.acc_n[c]
+            f[c][i] = self.acc_min[c] if k else NAN
+            f[n + c][i] = self.acc_max[c] if k else NAN
+            f[2 * n + c][i] = self.acc_sum[c] / k if k else NAN
+            f[3 * n + c][i] = k
+            self.acc_n[c] = 0
+        self.start = -1
+
+
+class History:
+    def __init__(self, channels=("temperature", "humidity", "pressure"), raw=60, tiers=DEFAULT_TIERS):
+        self.channels = tuple(channels)
+        self.raw = _Ring(raw, len(self.channels))
+        self.tiers = [_Tier(seconds, size, len(self.channels)) for seconds, size in tiers]
+        self._values = _zeros("f", len(self.channels))
+
+    def footprint(self):
+        # Bytes held by the sample arrays
+        return self.raw.nbytes() + sum(t.ring.nbytes() + 14 * len(self.channels) for t in self.tiers)
+
+    def clear(self):
+        self.raw.clear()
+        for tier in self.tiers:
+            tier.clear()
+
+    def newest(self):
+        # Time of the newest raw sample, or None
+        if not self.raw.count:
+            return None
+        return self.raw.t[self.raw.slot(self.raw.count - 1)]
+
+    def add(self, record):
+        # Insert a sample record as produced by sensors.SensorScheduler.
+        # Times must not go backwards: the rings are searched by time.
+        t = int(record["time"])
+        last = self.newest()
+        if last is not None and t < last:
+            if last - t > BACKSTEP_MAX:
+                print("History: clock went back {} s, starting over".format(last - t))
+                self.clear()
+            else:
+                t = last
+        values = self._values
+        for c in range(len(self.channels)):
+            v = record.get(self.channels[c])
+            values[c] = NAN if v is None else v
+        i = self.raw.push(t)
+        for c in range(len(self.channels)):
+            self.raw.fields[c][i] = values[c]
+        for tier in self.tiers:
+            tier.add(t, values)
+
+    def _source(self, channel, tier, field):
+        # (ring, values array, counts array or None) for a query
+        c = self.channels.index(channel)
+        if tier is None:
+            return self.raw, self.raw.fields[c], None
+        ring = self.tiers[tier].ring
+        n = len(self.channels)
+        offset = {"min": 0, "max": n, "mean": 2 * n}[field]
+        return ring, ring.fields[offset + c], ring.fields[3 * n + c]
+
+    def range(self, channel, t0, t1, out_t, out_v, tier=None, field="mean"):
+        # Copy samples with t0 <= time < t1 into the caller's arrays, oldest
+        # first, from the raw ring (tier=None) or a tier's min/max/mean.
+        # Returns the number of entries written.
+        ring, values, _ = self._source(channel, tier, field)
+        n = 0
+        limit = min(len(out_t), len(out_v))
+        for i in range(ring.first_at(t0), ring.count):
+            s = ring.slot(i)
+            if ring.t[s] >= t1 or n >= limit:
+                break
+            out_t[n] = ring.t[s]
+            out_v[n] = values[s]
+            n += 1
+        return n
+
+    def aggregate(self, channel, t0, t1, tier=None):
+        # (min, max, mean, samples) over t0 <= time < t1; None if empty
+        c = self.channels.index(channel)
+        n = len(self.channels)
+        if tier is None:
+            ring = self.raw
+            mins = maxs = means = ring.fields[c]
+            counts = None
+        else:
+            ring = self.tiers[tier].ring
+            mins = ring.fields[c]
+            maxs = ring.fields[n + c]
+            means = ring.fields[2 * n + c]
+            counts = ring.fields[3 * n + c]
+        lo = hi = total = 0.0
+        samples = 0
+        for i in range(ring.first_at(t0), ring.count):
+            s = ring.slot(i)
+            if ring.t[s] >= t1:
+                break
+            v = means[s]
+            if v != v:
+                continue
+            k = 1 if counts is None else int(counts[s])
+            if samples == 0 or mins[s] < lo:
+                lo = mins[s]
+            if samples == 0 or maxs[s] > hi:
+                hi = maxs[s]
+            total += v * k
+            samples += k
+        if tier is not None:
+            # Include the bucket still being accumulated
+            open_tier = self.tiers[tier]
+            k = open_tier.acc_n[c]
+            if k and t0 <= open_tier.start < t1:
+                if samples == 0 or open_tier.acc_min[c] < lo:
+                    lo = open_tier.acc_min[c]
+                if samples == 0 or open_tier.acc_max[c] > hi:
+                    hi = open_tier.acc_max[c]
+                total += open_tier.acc_sum[c]
+                samples += k
+        if not samples:
+            return None
+        return lo, hi, total / samples, samples
+
+    def latest(self, channel):
+        # Most recent raw value of a channel, or None
+        if not self.raw.count:
+            return None
+        v = self.raw.fields[self.channels.index(channel)][self.raw.slot(self.raw.count - 1)]
+        return None if v != v else v
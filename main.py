@@ -1,27 +1,82 @@
 from machine import I2C, Pin, SPI, Timer
+import machine
+import gc
 import time
-import framebuf
+import uasyncio
 from ahtx0 import AHT20
-from bmp280 import BMP280
+from bmp280 import BMP280, MODE_FORCED
 import st7735
-import vga1_8x8 as font
 from st7735 import ST7735
+from compositor import Compositor, Label, Number, RawBackground
+from rle565 import RLEImage
+from sensors import AHT20Sensor, BMP280Sensor, SensorScheduler, AdaptivePeriod
+from history import History
+from flashlog import FlashLog
+from devices import DeviceRegistry
+from derived import DerivedMetrics
+import filters
+from buttons import Buttons, PRESS, LONG
+import wifi_web
+from wifi_config import HOSTNAME
 
 # === I2C Setup ===
 i2c = I2C(0, scl=Pin(6), sda=Pin(5))
 
 # === Sensor Init ===
-aht = AHT20(i2c)
+# One bus scan on the first boot; later boots reuse the saved topology and
+# BMP280 calibration after a quick check of each device
+registry = DeviceRegistry(i2c)
+registry.detect()
+aht = AHT20(i2c, crc=True, reset=not registry.warm)
 
-# Try both BMP280 addresses
 bmp = None
-for addr in (0x76, 0x77):
+bmp_addr = registry.address("bmp280")
+if bmp_addr is not None:
     try:
-        bmp = BMP280(i2c, addr=addr)
-        print("BMP280 found at 0x{:02X}".format(addr))
-        break
-    except OSError:
-        pass
+        # Forced mode: one conversion per cycle instead of sampling continuously
+        bmp = BMP280(i2c, addr=bmp_addr, mode=MODE_FORCED,
+                     calibration=registry.calibration("bmp280"))
+        registry.set_calibration("bmp280", bmp.calibration)
+        print("BMP280 found at 0x{:02X}".format(bmp_addr))
+    except OSError as e:
+        print("BMP280 error:", e)
+registry.save()
+
+# Both sensors convert in parallel; a cycle lasts as long as the slowest one
+sensors = SensorScheduler([AHT20Sensor(aht)])
+if bmp:
+    sensors.add(BMP280Sensor(bmp))
+
+# Calibration and smoothing per channel, configured in filters.json
+try:
+    pipeline = filters.load()
+except Exception as e:
+    print("Filter config error:", e)
+    pipeline = filters.Pipeline()
+
+# Raw samples plus 1 min / 15 min / 1 h min-max-mean tiers, fixed size
+history = History()
+
+# Dew point, heat index, absolute humidity and 3 h pressure tendency,
+# updated in O(1) per sample and added to each sample record
+derived = DerivedMetrics()
+
+# Readings survive reboots: batched appends to rotating segments in log/
+log = FlashLog()
+restored = 0
+
+def restore_log():
+    # Records stamped later than the current clock are skipped, so after a
+    # power cycle (RTC back near the epoch) nothing is restored until NTP
+    # has set the clock; see sync_clock()
+    global restored
+    try:
+        restored += log.restore(history)
+        print("Restored {} readings from flash".format(restored))
+    except Exception as e:
+        print("Log restore error:", e)
+
+restore_log()
 
 # === SPI Display Setup ===
 spi = SPI(1, baudrate=20000000, sck=Pin(7), mosi=Pin(9))
@@ -39,88 +94,304 @@ WHITE = ST7735.color565(255, 255, 255)
 YELLOW = ST7735.color565(0, 255, 255)
 
 # === Load Background ===
-def draw_background():
+# Decoded from the compressed asset a row at a time (see tools/raw2rle.py),
+# so only the rows under a repainted region are ever in RAM. The flat image
+# it was made from is the fallback, read straight from flash; black if both
+# are missing.
+try:
+    background = RLEImage("bg.rle")
+except Exception as e:
+    print("Error loading bg.rle:", e)
     try:
-        with open("bg.raw", "rb") as f:
-            # Read the whole image (128x128 RGB565 = 32768 bytes)
-            buf = f.read(128 * 128 * 2)
-            tft.blit_buffer(buf, 0, 0, 128, 128)
-    except Exception as e:
-        print("Error drawing bg.raw:", e)
+        background = RawBackground("bg.raw", tft.width)
+    except OSError as e:
+        print("Error loading bg.raw:", e)
+        background = tft
+
+# === Screen Model ===
+ui = Compositor(tft, background)
+title_label = ui.add(Label(10, 5, "Temp Sensor 1", WHITE))
+# Small caption on the left, double-size reading in five 16px cells
+# Units sit in small captions under each reading so all five cells are
+# left for the value itself (100.0, -12.5, 101.3 all fit)
+ui.add(Label(4, 28, "Temp", WHITE))
+temp_value = ui.add(Number(44, 24, 5))
+ui.add(Label(116, 40, "F", WHITE))
+ui.add(Label(4, 52, "Hum", WHITE))
+hum_value = ui.add(Number(44, 48, 5))
+ui.add(Label(116, 64, "%", WHITE))
+ui.add(Label(4, 76, "Pres", WHITE))
+pres_value = ui.add(Number(44, 72, 5))
+ui.add(Label(92, 90, "inHg", WHITE))
+derived_label = ui.add(Label(4, 110, "", YELLOW))
+ui.invalidate()  # first flush paints the whole screen
+
+def draw_background():
+    # Repaint everything on the next flush
+    ui.invalidate()
 
 # === Dim & Wake Logic ===
 DIM_TIMEOUT = 120  # seconds
 dimmed = False
 last_active = time.time()
-wake_button = Pin(1, Pin.IN, Pin.PULL_UP)
 
 def dim_display():
     global dimmed
     tft.fill(0)
+    ui.invalidate()
     dimmed = True
     print("Display dimmed.")
 
-def wake_display(pin=None):
+def wake_display():
     global dimmed, last_active
     last_active = time.time()
     if dimmed:
-        draw_background()
-        show_current_data()
         dimmed = False
+        draw_background()
+        refresh.set()
         print("Display woken.")
 
-wake_button.irq(trigger=Pin.IRQ_FALLING, handler=wake_display)
+def read_now():
+    # Long press: wake and take a reading without waiting for the period
+    wake_display()
+    sample_now.set()
+
+# The IRQ only flags an edge; buttons.run() debounces and calls these
+buttons = Buttons()
+wake_pin = buttons.add(1, "wake")
+buttons.on("wake", PRESS, wake_display)
+buttons.on("wake", LONG, read_now)
 
 # === Sensor Display Function ===
-def show_current_data():
-    try:
-        temp_c = aht.temperature
-        hum = aht.relative_humidity
-        temp_f = temp_c * 9 / 5 + 32
-    except Exception as e:
-        print("AHT20 error:", e)
-        temp_f = hum = None
+latest = {}
 
+def update_readings(sample):
+    # Filter, derive, store and log a sample, then update the screen model
+    global latest
+    pipeline.apply(sample)
+    derived.update(sample)
+    history.add(sample)
     try:
-        pressure_hpa = bmp.pressure if bmp else None
-        pressure_inhg = pressure_hpa * 0.02953 if pressure_hpa else None
-    except Exception as e:
-        print("BMP280 error:", e)
-        pressure_inhg = None
+        log.append(sample)
+    except OSError as e:
+        print("Log write error:", e)
+    latest = sample
+    temp_c = sample.get("temperature")
+    hum = sample.get("humidity")
+    pressure_pa = sample.get("pressure")
 
-    tft.text(font, "Temp Sensor 1", 10, 5, WHITE)
+    temp_f = temp_c * 9 / 5 + 32 if temp_c is not None else None
+    pressure_inhg = pressure_pa / 100 * 0.02953 if pressure_pa else None
 
     if temp_f is not None:
-        tft.text(font, "Temp:{:.1f}F".format(temp_f), 10, 25, WHITE)
+        temp_value.set_value(temp_f, 1, WHITE)
     else:
-        tft.text(font, "Temp: ---", 10, 25, RED)
+        temp_value.set("---", RED)
 
     if hum is not None:
-        tft.text(font, "Hum :{:.1f}%".format(hum), 10, 35, WHITE)
+        hum_value.set_value(hum, 1, WHITE)
     else:
-        tft.text(font, "Hum : ---", 10, 35, RED)
+        hum_value.set("---", RED)
 
     if pressure_inhg is not None:
-        tft.text(font, "Pres:{:.2f}inHg".format(pressure_inhg), 10, 45, WHITE)
+        pres_value.set_value(pressure_inhg, 2, WHITE)
+    else:
+        pres_value.set("---", RED)
+
+    dew = sample.get("dew_point")
+    if dew is not None:
+        trend = derived.trend()
+        derived_label.set("Dew {:.0f}F {}".format(dew * 9 / 5 + 32, trend or ""))
     else:
-        tft.text(font, "Pres: ---", 10, 45, RED)
+        derived_label.set("")
+
+def show_current_data():
+    # Missing or failed channels come back as None
+    update_readings(sensors.read())
+    # Only the digit cells that changed since the last frame go out over SPI
+    try:
+        ui.flush()
+    except Exception as e:
+        print("Display error:", e)
+
+# === Runtime ===
+# Independent uasyncio tasks, each with its own period; a task waiting on
+# I2C, SPI or the network lets the others run
+POWER_PERIOD_MS = 1000
+HOUSEKEEPING_PERIOD = 300  # seconds
+refresh = uasyncio.Event()  # set when the screen model has changed
+sample_now = uasyncio.Event()  # cut the sampling wait short
+# Held for a whole flush or dim: tft.lock only covers one band at a time,
+# so without it the screen could be dimmed between the bands of a flush
+screen = uasyncio.Lock()
+
+# Sample every 15 s while readings move, backing off to 4 min when stable
+pacing = AdaptivePeriod()
+
+# === Light Sleep ===
+# Between samples the chip light-sleeps unless Wi-Fi is connecting or up
+# (the radio, mDNS and the web server need the loop running), a button
+# gesture is in progress or the panel is being written. Sleeps end in time
+# for the next Wi-Fi retry, and the wake button also ends a light sleep.
+LIGHTSLEEP_MIN_MS = 500
+SETTLE_MS = 50  # lets tasks woken by the last step finish first
+
+try:
+    import esp32
+    esp32.wake_on_ext0(pin=wake_pin, level=esp32.WAKEUP_ALL_LOW)
+except Exception as e:
+    print("No button wake from light sleep:", e)
+
+def can_lightsleep():
+    return not net.busy() and not buttons.busy and not screen.locked()
 
-# === Main Loop ===
-def show_data():
-    global last_active, dimmed
+def ms_until_dim():
+    if dimmed:
+        return HOUSEKEEPING_PERIOD * 1000
+    return max(0, (DIM_TIMEOUT - (time.time() - last_active)) * 1000 + 1000)
+
+async def idle(ms):
+    # Wait ms or until sample_now, in light sleep where possible
+    deadline = time.ticks_add(time.ticks_ms(), ms)
+    while not sample_now.is_set():
+        await uasyncio.sleep_ms(SETTLE_MS)
+        remaining = time.ticks_diff(deadline, time.ticks_ms())
+        if remaining <= 0:
+            return
+        chunk = min(remaining, ms_until_dim(), net.ms_until_retry())
+        if chunk >= LIGHTSLEEP_MIN_MS and can_lightsleep():
+            started = time.ticks_ms()
+            machine.lightsleep(chunk)
+            if time.ticks_diff(time.ticks_ms(), started) < chunk - SETTLE_MS:
+                buttons.poke()  # woken early, most likely by the button
+        else:
+            try:
+                await uasyncio.wait_for_ms(sample_now.wait(), min(remaining, POWER_PERIOD_MS))
+            except uasyncio.TimeoutError:
+                pass
+
+async def sample_task():
+    while True:
+        started = time.ticks_ms()
+        try:
+            sample = await sensors.read_async()
+            update_readings(sample)
+            pacing.update(sample)
+            # Only wake the display task if a shown value actually changed
+            if ui.pending():
+                refresh.set()
+        except Exception as e:
+            print("Sample error:", e)
+        # The period runs from the start of the cycle
+        elapsed = time.ticks_diff(time.ticks_ms(), started)
+        await idle(max(0, pacing.period * 1000 - elapsed))
+        sample_now.clear()
 
+async def display_task():
     while True:
-        now = time.time()
+        await refresh.wait()
+        refresh.clear()
+        async with screen:
+            if dimmed:
+                continue
+            try:
+                await ui.flush_async()
+            except Exception as e:
+                print("Display error:", e)
 
-        if not dimmed:
-            draw_background()
-            show_current_data()
+async def power_task():
+    while True:
+        if not dimmed and time.time() - last_active > DIM_TIMEOUT:
+            async with screen:
+                if not dimmed and time.time() - last_active > DIM_TIMEOUT:
+                    dim_display()
+        await uasyncio.sleep_ms(POWER_PERIOD_MS)
+
+async def housekeeping_task():
+    while True:
+        await uasyncio.sleep(HOUSEKEEPING_PERIOD)
+        gc.collect()
+        print("Free memory:", gc.mem_free())
 
-        if not dimmed and now - last_active > DIM_TIMEOUT:
-            dim_display()
+# === Network ===
+mdns = None
+web_started = False
 
-        time.sleep(60)
+def start_mdns(ip):
+    # The responder runs on the mdns_client's own task in this loop;
+    # returns the client so it can be stopped when the address changes
+    try:
+        from mdns_client import Client
+        from mdns_client.responder import Responder
+        client = Client(ip)
+        responder = Responder(client, own_ip=ip, host=HOSTNAME)
+        responder.advertise("_http", "_tcp", port=80)
+        print("mDNS started as {}.local".format(HOSTNAME))
+        return client
+    except Exception as e:
+        print("Failed to start mDNS:", e)
+        return None
+
+async def start_web():
+    try:
+        # Readings on any interface; Wi-Fi setup only from the config AP
+        await wifi_web.serve(data=lambda: latest, setup_allowed=net.on_ap)
+    except Exception as e:
+        print("Web server error:", e)
+
+clock_synced = False
+
+async def sync_clock():
+    # Set the RTC once per boot so samples, the log and History share one
+    # time base; replays the log if the unset clock skipped it at boot and
+    # dates a Wi-Fi lease saved before the clock was set
+    global clock_synced
+    await uasyncio.sleep_ms(0)
+    try:
+        import ntptime
+        ntptime.settime()  # one UDP exchange, blocks for at most ~1 s
+    except Exception as e:
+        print("NTP error:", e)
+        return
+    clock_synced = True
+    print("Clock set by NTP.")
+    net.clock_set()
+    if not restored:
+        restore_log()
+
+def on_network(ip):
+    # Called by the Wi-Fi task whenever the serving address changes
+    global mdns, web_started
+    if mdns:
+        mdns.stop()
+        mdns = None
+    if ip is None:
+        return
+    if not clock_synced and net.sta.isconnected():
+        uasyncio.create_task(sync_clock())
+    mdns = start_mdns(ip)
+    if not web_started:
+        web_started = True
+        uasyncio.create_task(start_web())
+
+# wifi.WiFi: connects, reconnects and falls back to the config AP in the
+# background; created with the runtime since it needs the radio
+net = None
+
+async def main():
+    global net
+    import wifi
+    net = wifi.WiFi(on_network)
+    # Sensors and display start at once; the network comes up on its own
+    uasyncio.create_task(sample_task())
+    uasyncio.create_task(display_task())
+    uasyncio.create_task(power_task())
+    uasyncio.create_task(buttons.run())
+    uasyncio.create_task(housekeeping_task())
+    uasyncio.create_task(net.run())
+    while True:
+        await uasyncio.sleep(3600)
 
 # === Start ===
-wake_display()  # Show first frame
-show_data()
+if __name__ == "__main__":
+    uasyncio.run(main())
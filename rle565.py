@@ -0,0 +1,127 @@
+# rle565.py - run-length encoded RGB565 images streamed a row at a time
+#
+# File layout (little-endian header, pixel bytes big-endian as sent to the panel):
+#   "R565", version:u8, flags:u8, width:u16, height:u16, palette_size:u16
+#   palette:  palette_size * 2 bytes (only when flags & FLAG_PALETTE)
+#   rows:     (height + 1) * u32 absolute offsets of each row's run data
+#   runs:     count:u8 (1..255) followed by a palette index:u8 or color:2 bytes
+# Runs never cross a row, so any row can be decoded on its own.
+import struct
+
+MAGIC = b"R565"
+VERSION = 1
+FLAG_PALETTE = 0x01
+_HEADER = "<4sBBHHH"
+_HEADER_SIZE = 12
+
+# Input chunk; a multiple of both record sizes so records never straddle reads
+_CHUNK = 192
+
+
+class RLEImage:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, flags, w, h, n = struct.unpack(_HEADER, f.read(_HEADER_SIZE))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("not an RLE565 image")
+            self.palette = f.read(n * 2) if flags & FLAG_PALETTE else None
+        self.width = w
+        self.height = h
+        self._table = _HEADER_SIZE + n * 2
+        self._record = 2 if self.palette else 3
+        # Fixed working set: one decoded row, one input chunk, one table entry pair
+        self._line = bytearray(w * 2)
+        self._in = bytearray(_CHUNK)
+        self._pos = bytearray(8)
+
+    def _decode_row(self, f, row):
+        # Decode one row into self._line
+        f.seek(self._table + row * 4)
+        f.readinto(self._pos)
+        start, end = struct.unpack("<II", self._pos)
+        f.seek(start)
+        line = self._line
+        buf = self._in
+        mv = memoryview(buf)
+        pal = self.palette
+        rec = self._record
+        out = 0
+        left = end - start
+        while left > 0:
+            n = f.readinto(mv[:min(_CHUNK, left)])
+            if not n:
+                break
+            left -= n
+            for i in range(0, n - rec + 1, rec):
+                count = buf[i]
+                if pal:
+                    j = buf[i + 1] * 2
+                    hi = pal[j]
+                    lo = pal[j + 1]
+                else:
+                    hi = buf[i + 1]
+                    lo = buf[i + 2]
+                for _ in range(count):
+                    line[out] = hi
+                    line[out + 1] = lo
+                    out += 2
+        return line
+
+    def rows(self, y=0, h=None):
+        # Yield each decoded row in turn; the same buffer is reused
+        if h is None:
+            h = self.height - y
+        with open(self.path, "rb") as f:
+            for row in range(y, y + h):
+                yield self._decode_row(f, row)
+
+    def draw(self, tft, x=0, y=0):
+        tft.write_rows(x, y, self.width, self.height, self.rows())
+
+    async def draw_async(self, tft, x=0, y=0):
+        await tft.write_rows_async(x, y, self.width, self.height, self.rows())
+
+    def background_rect(self, x, y, w, h, buf):
+        row_bytes = w * 2
+        line = memoryview(self._line)
+        r = 0
+        for _ in self.rows(y, h):
+            buf[r * row_bytes:(r + 1) * row_bytes] = line[x * 2:(x + w) * 2]
+            r += 1
+
+
+def encode(data, width, height):
+    # Encode a flat big-endian RGB565 image; uses a palette when it fits a byte
+    colors = {}
+    for i in range(0, width * height * 2, 2):
+        colors[bytes(data[i:i + 2])] = None
+    palette = list(colors) if len(colors) <= 256 else None
+    index = {c: i for i, c in enumerate(palette)} if palette else None
+
+    runs = []
+    offsets = []
+    for row in range(height):
+        offsets.append(len(runs))
+        base = row * width * 2
+        col = 0
+        while col < width:
+            px = bytes(data[base + col * 2:base + col * 2 + 2])
+            count = 1
+            while (col + count < width and count < 255
+                   and data[base + (col + count) * 2:base + (col + count) * 2 + 2] == px):
+                count += 1
+            runs.append(count)
+            if palette:
+                runs.append(index[px])
+            else:
+                runs.extend(px)
+            col += count
+    offsets.append(len(runs))
+
+    n = len(palette) if palette else 0
+    head = struct.pack(_HEADER, MAGIC, VERSION, FLAG_PALETTE if palette else 0, width, height, n)
+    pal = b"".join(palette) if palette else b""
+    data_start = len(head) + len(pal) + (height + 1) * 4
+    table = b"".join(struct.pack("<I", data_start + o) for o in offsets)
+    return head + pal + table + bytes(runs)
@@ -0,0 +1,164 @@
+# sensors.py - start every sensor's conversion at once, collect as each is ready
+#
+# A cycle triggers all sensors, then polls each one from the time its
+# conversion should be done and collects it into one sample record:
+#   {"time": <epoch seconds>, "temperature": degC, "humidity": %, ...}
+# so a cycle takes about as long as the slowest sensor, not the sum.
+import time
+
+import uasyncio
+
+# Poll interval once a sensor's expected conversion time has passed
+_POLL_MS = 2
+
+
+class Sensor:
+    # Channels this sensor fills in; set to None when a read fails
+    channels = ()
+    # Give up on a conversion after this long
+    timeout_ms = 200
+
+    def trigger(self):
+        # Start a conversion; return the ms until ready() is worth polling
+        raise NotImplementedError()
+
+    def ready(self):
+        raise NotImplementedError()
+
+    def collect(self, record):
+        # Read the finished conversion into `record`
+        raise NotImplementedError()
+
+
+class AHT20Sensor(Sensor):
+    channels = ("temperature", "humidity")
+
+    def __init__(self, aht):
+        self.aht = aht
+
+    def trigger(self):
+        return self.aht.trigger()
+
+    def ready(self):
+        return self.aht.ready()
+
+    def collect(self, record):
+        record["temperature"], record["humidity"] = self.aht.collect()
+
+
+class BMP280Sensor(Sensor):
+    channels = ("bmp_temperature", "pressure")
+
+    def __init__(self, bmp):
+        self.bmp = bmp
+
+    def trigger(self):
+        return self.bmp.trigger()
+
+    def ready(self):
+        return self.bmp.ready()
+
+    def collect(self, record):
+        record["bmp_temperature"], record["pressure"] = self.bmp.collect()
+
+
+class SensorScheduler:
+    def __init__(self, sensors=None):
+        self.sensors = list(sensors or ())
+        self.errors = 0
+        self.last_cycle_ms = 0
+
+    def add(self, sensor):
+        self.sensors.append(sensor)
+        return sensor
+
+    def _start(self, record):
+        # Trigger everything; returns [(sensor, due ticks)] still pending
+        now = time.ticks_ms()
+        pending = []
+        for sensor in self.sensors:
+            try:
+                pending.append((sensor, time.ticks_add(now, sensor.trigger())))
+            except Exception as e:
+                self._fail(sensor, record, e)
+        return pending
+
+    def _poll(self, pending, record, started):
+        # Collect every sensor that is ready; returns ms until the next poll
+        now = time.ticks_ms()
+        wait = None
+        i = 0
+        while i < len(pending):
+            sensor, due = pending[i]
+            delay = time.ticks_diff(due, now)
+            if delay <= 0:
+                try:
+                    if sensor.ready():
+                        sensor.collect(record)
+                        pending.pop(i)
+                        continue
+                    if time.ticks_diff(now, started) > sensor.timeout_ms:
+                        raise Exception("timeout")
+                except Exception as e:
+                    self._fail(sensor, record, e)
+                    pending.pop(i)
+                    continue
+                delay = _POLL_MS
+            wait = delay if wait is None else min(wait, delay)
+            i += 1
+        return wait
+
+    def _fail(self, sensor, record, error):
+        self.errors += 1
+        print("{} error: {}".format(type(sensor).__name__, error))
+        for channel in sensor.channels:
+            record[channel] = None
+
+    def read(self):
+        # One blocking cycle; returns the sample record
+        record = {"time": time.time()}
+        started = time.ticks_ms()
+        pending = self._start(record)
+        while pending:
+            time.sleep_ms(self._poll(pending, record, started) or 0)
+        self.last_cycle_ms = time.ticks_diff(time.ticks_ms(), started)
+        return record
+
+    async def read_async(self):
+        # Same as read(), but other tasks run while conversions are pending
+        record = {"time": time.time()}
+        started = time.ticks_ms()
+        pending = self._start(record)
+        while pending:
+            await uasyncio.sleep_ms(self._poll(pending, record, started) or 0)
+        self.last_cycle_ms = time.ticks_diff(time.ticks_ms(), started)
+        return record
+
+
+class AdaptivePeriod:
+    # Seconds until the next cycle: halved (down to `fastest`) when any
+    # channel moved by at least its step since the last sample, doubled (up
+    # to `slowest`) while all are stable. Steps are in record units and sit
+    # just above the displayed precision, so sensor noise does not count.
+    def __init__(self, fastest=15, slowest=240, steps=None):
+        self.fastest = fastest
+        self.slowest = slowest
+        self.steps = list((steps or {"temperature": 0.1, "humidity": 0.2, "pressure": 50}).items())
+        self._last = {}
+        self.period = fastest
+
+    def update(self, record):
+        moved = False
+        for channel, step in self.steps:
+            v = record.get(channel)
+            if v is None:
+                continue
+            last = self._last.get(channel)
+            if last is None or abs(v - last) >= step:
+                moved = True
+            self._last[channel] = v
+        if moved:
+            self.period = max(self.fastest, self.period // 2)
+        else:
+            self.period = min(self.slowest, self.period * 2)
+        return self.period
@@ -1,6 +1,8 @@
 # st7735.py - ST7735S/R driver for MicroPython
+from collections import namedtuple
 from time import sleep_ms
 import framebuf
+import uasyncio
 
 # ST7735 commands
 _SWRESET = 0x01
@@ -13,8 +15,115 @@ _MADCTL  = 0x36
 _COLMOD  = 0x3A
 _INVON   = 0x21
 
+_MADCTL_BGR = 0x08
+
+# Text is rasterized one 8px line at a time
+_LINE_H = 8
+
+# Bytes written between yields to the event loop by the async methods
+ASYNC_CHUNK = 1024
+
+# Panel profiles. `offsets` and `madctl` are indexed by rotation 0-3;
+# `bgr` sets the color-order bit in MADCTL, `invert` sends INVON at init.
+Profile = namedtuple("Profile", ("offsets", "madctl", "bgr", "invert"))
+
+# Bare ST7735 with the panel mapped at the origin of GRAM
+GENERIC = Profile(
+    offsets=((0, 0), (0, 0), (0, 0), (0, 0)),
+    madctl=(0x00, 0x60, 0xC0, 0xA0),
+    bgr=False,
+    invert=False,
+)
+
+# 1.44" 128x128 ST7735S modules: panel starts at column 2, row 1 of GRAM,
+# mirrored in both axes with BGR color order at rotation 0
+GREENTAB_128 = Profile(
+    offsets=((2, 1), (1, 2), (2, 1), (1, 2)),
+    madctl=(0xC0, 0xA0, 0x00, 0x60),
+    bgr=True,
+    invert=False,
+)
+
+
+def _fill_run(run, color):
+    # Fill a byte buffer with big-endian RGB565 `color`
+    hi = (color >> 8) & 0xFF
+    lo = color & 0xFF
+    for i in range(0, len(run), 2):
+        run[i] = hi
+        run[i + 1] = lo
+
+
+def swap565(color):
+    # framebuf stores RGB565 little-endian, the panel expects big-endian
+    return ((color & 0xFF) << 8) | ((color >> 8) & 0xFF)
+
+
+# Two-entry RGB565 palette used to blit 1-bit font glyphs in a chosen color
+_palette = framebuf.FrameBuffer(bytearray(4), 2, 1, framebuf.RGB565)
+
+# One 8x8 1-bit glyph, used when scaling text up
+_glyph = bytearray(8)
+_glyph_fb = framebuf.FrameBuffer(_glyph, 8, 8, framebuf.MONO_HLSB)
+
+
+def _draw_scaled(fb, bitmap, text, x, y, value, scale):
+    size = 8 * scale
+    count = len(bitmap) // 8 if bitmap is not None else 0
+    for i in range(len(text)):
+        if bitmap is None:
+            _glyph_fb.fill(0)
+            _glyph_fb.text(text[i], 0, 0, 1)
+        else:
+            code = ord(text[i]) - 32
+            if not 0 <= code < count:
+                continue
+            _glyph[:] = bitmap[code * 8:code * 8 + 8]
+        gx = x + i * size
+        for row in range(8):
+            bits = _glyph[row]
+            col = 0
+            # One fill_rect per horizontal run of lit pixels
+            while bits:
+                if bits & 0x80:
+                    start = col
+                    while bits & 0x80:
+                        bits = (bits << 1) & 0xFF
+                        col += 1
+                    fb.fill_rect(gx + start * scale, y + row * scale,
+                                 (col - start) * scale, scale, value)
+                else:
+                    bits = (bits << 1) & 0xFF
+                    col += 1
+
+
+def draw_text(fb, font, text, x, y, value, scale=1):
+    # Draw `text` into an RGB565 framebuffer, leaving unlit pixels untouched.
+    # `value` is the raw framebuf pixel value (byte-swapped for the panel).
+    # `font` is an 8x8 bitmap starting at ' ' (e.g. vga1_8x8 or its FONT),
+    # or None for the framebuf built-in font. Each glyph covers 8 * scale
+    # pixels square.
+    bitmap = getattr(font, "FONT", font)
+    if scale > 1:
+        _draw_scaled(fb, bitmap, text, x, y, value, scale)
+        return
+    if bitmap is None:
+        fb.text(text, x, y, value)
+        return
+    key = value ^ 0xFFFF
+    _palette.pixel(0, 0, key)
+    _palette.pixel(1, 0, value)
+    glyphs = memoryview(bitmap)
+    count = len(bitmap) // 8
+    for i in range(len(text)):
+        code = ord(text[i]) - 32
+        if 0 <= code < count:
+            glyph = framebuf.FrameBuffer(glyphs[code * 8:code * 8 + 8], 8, 8, framebuf.MONO_HLSB)
+            fb.blit(glyph, x + i * 8, y, key, _palette)
+
+
 class ST7735:
-    def __init__(self, spi, width, height, cs, dc, reset=None, rotation=0):
+    def __init__(self, spi, width, height, cs, dc, reset=None, rotation=0, profile=GENERIC):
         self.spi = spi
         self.cs = cs
         self.dc = dc
@@ -22,20 +131,48 @@ class ST7735:
         self.width = width
         self.height = height
         self.rotation = rotation
+        self.profile = profile
+        self.x_offset, self.y_offset = profile.offsets[rotation % 4]
 
         self.cs.init(self.cs.OUT, value=1)
         self.dc.init(self.dc.OUT, value=0)
         if self.rst:
             self.rst.init(self.rst.OUT, value=1)
-        self.buffer = bytearray(self.height * self.width * 2)
-        self.framebuf = framebuf.FrameBuffer(self.buffer, self.width, self.height, framebuf.RGB565)
+
+        # Preallocated scratch: command byte, CASET/RASET params, one pixel,
+        # one full-width run of a single color and one RGB565 text strip
+        self._cmd = bytearray(1)
+        self._args = bytearray(4)
+        self._px = bytearray(2)
+        self._run = bytearray(self.width * 2)
+        self._run_color = None
+        # fill_rect_async has its own run, filled under the lock, so neither a
+        # queued fill nor a synchronous one recolors it between chunks
+        self._arun = bytearray(self.width * 2)
+        self._arun_color = None
+        self._strip = bytearray(self.width * _LINE_H * 2)
+        # Full-screen background image, allocated once by load_background()
+        self._bg = None
+        # Optional glyphcache.GlyphCache used by text() for opaque text in
+        # the cache's font
+        self.glyphs = None
+        # Held by the async methods for a whole window write, since other
+        # tasks must not issue commands between chunks
+        self.lock = uasyncio.Lock()
+        # Last CASET/RASET ranges sent, so repeated windows skip them
+        self._cols = None
+        self._rows = None
 
         self.init()
 
     def write_cmd(self, cmd):
+        # Arbitrary commands may move the address window; forget the cache
+        self._cols = None
+        self._rows = None
+        self._cmd[0] = cmd
         self.cs(0)
         self.dc(0)
-        self.spi.write(bytearray([cmd]))
+        self.spi.write(self._cmd)
         self.cs(1)
 
     def write_data(self, data):
@@ -64,55 +201,319 @@ class ST7735:
         self.write_data(bytearray([0x05]))  # 16-bit color
         sleep_ms(10)
 
+        madctl = self.profile.madctl[self.rotation % 4]
+        if self.profile.bgr:
+            madctl |= _MADCTL_BGR
         self.write_cmd(_MADCTL)
-        if self.rotation == 0:
-            self.write_data(bytearray([0x00]))
-        elif self.rotation == 1:
-            self.write_data(bytearray([0x60]))
-        elif self.rotation == 2:
-            self.write_data(bytearray([0xC0]))
-        elif self.rotation == 3:
-            self.write_data(bytearray([0xA0]))
+        self.write_data(bytearray([madctl]))
+
+        if self.profile.invert:
+            self.write_cmd(_INVON)
 
         self.write_cmd(_DISPON)
         sleep_ms(100)
 
+    def _param(self, cmd, a, b):
+        # Command + 4 byte parameter inside an already selected CS frame
+        self._cmd[0] = cmd
+        self.dc(0)
+        self.spi.write(self._cmd)
+        args = self._args
+        args[0] = (a >> 8) & 0xFF
+        args[1] = a & 0xFF
+        args[2] = (b >> 8) & 0xFF
+        args[3] = b & 0xFF
+        self.dc(1)
+        self.spi.write(args)
+
+    def _window(self, x0, y0, x1, y1):
+        # CASET/RASET/RAMWR with CS already low; leaves DC high for pixel data.
+        # Ranges equal to the last ones sent are skipped, RAMWR always
+        # restarts the write pointer at the window origin.
+        x0 += self.x_offset
+        x1 += self.x_offset
+        y0 += self.y_offset
+        y1 += self.y_offset
+        cols = (x0 << 16) | x1
+        rows = (y0 << 16) | y1
+        if cols != self._cols:
+            self._param(_CASET, x0, x1)
+            self._cols = cols
+        if rows != self._rows:
+            self._param(_RASET, y0, y1)
+            self._rows = rows
+        self._cmd[0] = _RAMWR
+        self.dc(0)
+        self.spi.write(self._cmd)
+        self.dc(1)
+
     def set_window(self, x0, y0, x1, y1):
-        self.write_cmd(_CASET)
-        self.write_data(bytearray([(x0 >> 8) & 0xFF, x0 & 0xFF, (x1 >> 8) & 0xFF, x1 & 0xFF]))
-        self.write_cmd(_RASET)
-        self.write_data(bytearray([(y0 >> 8) & 0xFF, y0 & 0xFF, (y1 >> 8) & 0xFF, y1 & 0xFF]))
-        self.write_cmd(_RAMWR)
+        self.cs(0)
+        self._window(x0, y0, x1, y1)
+        self.cs(1)
+
+    def _color_run(self, color):
+        # The run buffer holds one full row of `color`; refilled only on change
+        if self._run_color != color:
+            _fill_run(self._run, color)
+            self._run_color = color
+        return self._run
 
     def fill(self, color):
-        c = color.to_bytes(2, 'big')
-        self.set_window(0, 0, self.width - 1, self.height - 1)
+        self.fill_rect(0, 0, self.width, self.height, color)
+
+    def fill_rect(self, x, y, w, h, color):
+        # Streams the preallocated run buffer repeatedly into one window
+        if x < 0:
+            w += x
+            x = 0
+        if y < 0:
+            h += y
+            y = 0
+        w = min(w, self.width - x)
+        h = min(h, self.height - y)
+        if w <= 0 or h <= 0:
+            return
+        run = memoryview(self._color_run(color))
+        left = w * h * 2
         self.cs(0)
-        self.dc(1)
-        self.spi.write(c * self.width * self.height)
+        self._window(x, y, x + w - 1, y + h - 1)
+        while left > 0:
+            n = min(left, len(run))
+            self.spi.write(run[:n])
+            left -= n
         self.cs(1)
 
+    def hline(self, x, y, w, color):
+        self.fill_rect(x, y, w, 1, color)
+
+    def vline(self, x, y, h, color):
+        self.fill_rect(x, y, 1, h, color)
+
     def pixel(self, x, y, color):
         if 0 <= x < self.width and 0 <= y < self.height:
-            self.set_window(x, y, x, y)
-            self.write_data(color.to_bytes(2, 'big'))
+            px = self._px
+            px[0] = (color >> 8) & 0xFF
+            px[1] = color & 0xFF
+            self.blit_buffer(px, x, y, 1, 1)
 
-    def text(self, font, text, x, y, color):
-        self.framebuf.fill(0)
-        self.framebuf.text(text, 0, 0, color)
-        for row in range(8):
-            for col in range(len(text) * 8):
-                p = self.framebuf.pixel(col, row)
-                if p:
-                    self.pixel(x + col, y + row, color)
+    def load_background(self, path):
+        # Read a width x height big-endian RGB565 image into the resident
+        # buffer. The buffer is allocated on the first call and reused after.
+        if self._bg is None:
+            self._bg = bytearray(self.width * self.height * 2)
+        with open(path, "rb") as f:
+            f.readinto(self._bg)
+
+    def draw_background(self):
+        if self._bg is None:
+            self.fill(0)
+        else:
+            self.blit_buffer(self._bg, 0, 0, self.width, self.height)
+
+    def background_rect(self, x, y, w, h, buf):
+        # Copy the background pixels under (x, y, w, h) into buf
+        row = w * 2
+        if self._bg is None:
+            for i in range(w * h * 2):
+                buf[i] = 0
+            return
+        src = memoryview(self._bg)
+        for r in range(h):
+            s = ((y + r) * self.width + x) * 2
+            buf[r * row:(r + 1) * row] = src[s:s + row]
+
+    def restore_background(self, x, y, w, h):
+        # Re-send the background under a rectangle, e.g. before drawing a
+        # shorter string over a longer one
+        if x < 0:
+            w += x
+            x = 0
+        if y < 0:
+            h += y
+            y = 0
+        w = min(w, self.width - x)
+        h = min(h, self.height - y)
+        if w <= 0 or h <= 0 or self._bg is None:
+            return
+        src = memoryview(self._bg)
+        row = w * 2
+        self.cs(0)
+        self._window(x, y, x + w - 1, y + h - 1)
+        if w == self.width:
+            self.spi.write(src[y * row:(y + h) * row])
+        else:
+            for r in range(h):
+                s = ((y + r) * self.width + x) * 2
+                self.spi.write(src[s:s + row])
+        self.cs(1)
+
+    def text(self, font, text, x, y, color, background=None):
+        # Rasterize the whole string into the strip, then send it in one
+        # window. Without a background color the text is composed over the
+        # resident background image, or sent as lit runs if there is none.
+        if x < 0 or y < 0:
+            return
+        glyphs = self.glyphs
+        if background is not None and glyphs is not None and x + len(text) * 8 <= self.width:
+            # Only text in the cache's own font can use its tiles
+            if getattr(font, "FONT", font) is glyphs.font:
+                glyphs.draw(self, text, x, y, color, background)
+                return
+        w = min(len(text) * 8, self.width - x)
+        h = min(_LINE_H, self.height - y)
+        if w <= 0 or h <= 0:
+            return
+        strip = memoryview(self._strip)[:w * h * 2]
+        fb = framebuf.FrameBuffer(strip, w, h, framebuf.RGB565)
+        if background is not None:
+            fb.fill(swap565(background))
+        elif self._bg is not None:
+            self.background_rect(x, y, w, h, strip)
+        else:
+            fb.fill(0)
+            draw_text(fb, font, text, 0, 0, 1)
+            self._text_runs(w, h, x, y, color)
+            return
+        draw_text(fb, font, text, 0, 0, swap565(color))
+        self.blit_buffer(strip, x, y, w, h)
+
+    def _text_runs(self, w, h, x, y, color):
+        strip = self._strip
+        mv = memoryview(self._color_run(color))
+        self.cs(0)
+        for row in range(h):
+            base = row * w * 2
+            start = -1
+            for col in range(w + 1):
+                lit = col < w and strip[base + col * 2]
+                if lit and start < 0:
+                    start = col
+                elif not lit and start >= 0:
+                    self._window(x + start, y + row, x + col - 1, y + row)
+                    self.spi.write(mv[:(col - start) * 2])
+                    start = -1
+        self.cs(1)
 
     def blit_buffer(self, buf, x, y, w, h):
-        self.set_window(x, y, x + w - 1, y + h - 1)
         self.cs(0)
-        self.dc(1)
+        self._window(x, y, x + w - 1, y + h - 1)
         self.spi.write(buf)
         self.cs(1)
 
+    def write_rows(self, x, y, w, h, rows):
+        # Stream an iterable of pixel buffers into one window, e.g. rows
+        # decoded on the fly from a compressed image
+        self.cs(0)
+        self._window(x, y, x + w - 1, y + h - 1)
+        for buf in rows:
+            self.spi.write(buf)
+        self.cs(1)
+
+    # === Async variants ===
+    # These send at most `chunk` bytes at a time and yield to the uasyncio
+    # loop in between, so network and input tasks keep running during
+    # large transfers. The synchronous methods above do not take the lock,
+    # so they must not be called while an async transfer is in progress.
+
+    async def blit_buffer_async(self, buf, x, y, w, h, chunk=ASYNC_CHUNK):
+        mv = memoryview(buf)
+        async with self.lock:
+            self.cs(0)
+            self._window(x, y, x + w - 1, y + h - 1)
+            for i in range(0, len(mv), chunk):
+                self.spi.write(mv[i:i + chunk])
+                self.cs(1)
+                await uasyncio.sleep_ms(0)
+                self.cs(0)
+                self.dc(1)
+            self.cs(1)
+
+    async def write_rows_async(self, x, y, w, h, rows):
+        async with self.lock:
+            self.cs(0)
+            self._window(x, y, x + w - 1, y + h - 1)
+            for buf in rows:
+                self.spi.write(buf)
+                self.cs(1)
+                await uasyncio.sleep_ms(0)
+                self.cs(0)
+                self.dc(1)
+            self.cs(1)
+
+    async def fill_rect_async(self, x, y, w, h, color, chunk=ASYNC_CHUNK):
+        if x < 0:
+            w += x
+            x = 0
+        if y < 0:
+            h += y
+            y = 0
+        w = min(w, self.width - x)
+        h = min(h, self.height - y)
+        if w <= 0 or h <= 0:
+            return
+        left = w * h * 2
+        async with self.lock:
+            if self._arun_color != color:
+                _fill_run(self._arun, color)
+                self._arun_color = color
+            run = memoryview(self._arun)
+            step = min(len(run), chunk)
+            self.cs(0)
+            self._window(x, y, x + w - 1, y + h - 1)
+            while left > 0:
+                n = min(left, step)
+                self.spi.write(run[:n])
+                left -= n
+                self.cs(1)
+                await uasyncio.sleep_ms(0)
+                self.cs(0)
+                self.dc(1)
+            self.cs(1)
+
+    async def fill_async(self, color):
+        await self.fill_rect_async(0, 0, self.width, self.height, color)
+
     @staticmethod
     def color565(r, g, b):
         return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+
+
+class DoubleBuffer:
+    # Two w x h RGB565 buffers: draw into `fb` while the previous frame is
+    # still being sent by present(). Pixel values written through `fb` must
+    # be byte-swapped with swap565().
+    def __init__(self, tft, w, h, chunk=ASYNC_CHUNK):
+        self.tft = tft
+        self.w = w
+        self.h = h
+        self.chunk = chunk
+        self._bufs = (bytearray(w * h * 2), bytearray(w * h * 2))
+        self._fbs = (
+            framebuf.FrameBuffer(self._bufs[0], w, h, framebuf.RGB565),
+            framebuf.FrameBuffer(self._bufs[1], w, h, framebuf.RGB565),
+        )
+        self._back = 0
+        self._task = None
+
+    @property
+    def buffer(self):
+        return self._bufs[self._back]
+
+    @property
+    def fb(self):
+        return self._fbs[self._back]
+
+    async def wait(self):
+        # Block until the frame handed to present() has gone out
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def present(self, x=0, y=0):
+        # Start sending the back buffer and make the other one the back
+        await self.wait()
+        front = self._bufs[self._back]
+        self._back ^= 1
+        self._task = uasyncio.create_task(
+            self.tft.blit_buffer_async(front, x, y, self.w, self.h, self.chunk))
@@ -0,0 +1,78 @@
+# bench_display.py - SPI cost of the display drivers without a panel
+#
+# Runs st7735.ST7735, st7735_128x128.ST7735S and main.show_current_data()
+# against the instrumented stand-ins in fakehw and prints one line per
+# primitive: SPI transactions, bytes, chip-select assertions and bytes
+# allocated. The output is deterministic, so diff it between commits:
+#
+#   cd <repo> && micropython tools/bench_display.py > bench_output.txt
+import os
+import sys
+
+_here = __file__.rsplit("/", 1)[0] if "/" in __file__ else "."
+_root = _here + "/.."
+sys.path.insert(0, _root)
+sys.path.insert(0, _here)
+
+import fakehw  # noqa: E402
+from benchutil import AllocMeter  # noqa: E402
+
+fakehw.install()
+
+from machine import Pin, SPI  # noqa: E402
+
+WHITE = 0xFFFF
+RED = 0xF800
+
+meter = AllocMeter()
+
+
+def measure(label, fn, *args):
+    fakehw.counters.reset()
+    meter.start()
+    fn(*args)
+    alloc = meter.stop()
+    tx, nbytes, cs = fakehw.counters.snapshot()
+    print("{:<36} tx={:<6} bytes={:<7} cs={:<5} alloc={}".format(label, tx, nbytes, cs, alloc))
+
+
+def bench_driver(name, tft):
+    tft.cs.chip_select = True
+    block = bytearray(16 * 16 * 2)
+    # Start every run from a known window so the window cache is comparable
+    tft.set_window(0, 0, 0, 0)
+    measure(name + ".set_window", tft.set_window, 0, 0, tft.width - 1, tft.height - 1)
+    measure(name + ".set_window(repeat)", tft.set_window, 0, 0, tft.width - 1, tft.height - 1)
+    measure(name + ".pixel", tft.pixel, 5, 5, WHITE)
+    measure(name + ".fill", tft.fill, 0)
+    measure(name + ".fill_rect(32x8)", tft.fill_rect, 10, 25, 32, 8, RED)
+    measure(name + ".blit_buffer(16x16)", tft.blit_buffer, block, 8, 8, 16, 16)
+    measure(name + ".text(transparent)", tft.text, None, "Temp:72.3F", 10, 25, WHITE)
+    measure(name + ".text(background)", tft.text, None, "Temp:72.3F", 10, 25, WHITE, 0)
+
+
+def bench_main():
+    # Import the real application; its start-up is guarded by __main__
+    import main
+    main.cs.chip_select = True
+    aht = main.i2c.devices[0x38]
+    measure("main.show_current_data(first)", main.show_current_data)
+    measure("main.show_current_data(steady)", main.show_current_data)
+    aht.temperature += 0.06  # 72.5F -> 72.6F, one digit changes
+    measure("main.show_current_data(digit)", main.show_current_data)
+
+
+def run():
+    import st7735
+    import st7735_128x128
+
+    tft = st7735.ST7735(SPI(1), 128, 128, cs=Pin(2), dc=Pin(3), reset=Pin(4), rotation=2)
+    bench_driver("ST7735", tft)
+    tft = st7735_128x128.ST7735S(SPI(1), Pin(2), Pin(3), Pin(4))
+    bench_driver("ST7735S", tft)
+    bench_main()
+
+
+if __name__ == "__main__":
+    os.chdir(_root)
+    run()
@@ -0,0 +1,118 @@
+# bench_sensors.py - sensor driver cost and BMP280 compensation accuracy
+#
+# Checks that the BMP280 float compensation agrees with the datasheet's
+# 64-bit integer reference over the ADC range that maps to the sensor's
+# operating range, then reports I2C transactions and bytes allocated per
+# sample for each path, the I2C cost of sensor start-up on a cold and a
+# warm boot, the allocation of a typical filter pipeline and the cost of
+# one SensorScheduler cycle. Exits non-zero if agreement fails.
+#
+#   cd <repo> && micropython tools/bench_sensors.py
+import sys
+
+_here = __file__.rsplit("/", 1)[0] if "/" in __file__ else "."
+sys.path.insert(0, _here + "/..")
+sys.path.insert(0, _here)
+
+import fakehw  # noqa: E402
+from benchutil import AllocMeter  # noqa: E402
+
+fakehw.install()
+
+from machine import I2C  # noqa: E402
+
+# Largest allowed difference between the float and integer paths. The
+# integer path itself resolves 0.01 degC and 1/256 Pa.
+TEMP_TOL = 0.01
+PRESS_TOL = 1.0
+
+# Operating range of the BMP280
+TEMP_RANGE = (-40.0, 85.0)
+PRESS_RANGE = (30000.0, 110000.0)
+
+SAMPLES = 100
+
+meter = AllocMeter()
+
+
+def check_agreement(bmp, step=4099):
+    worst_t = worst_p = 0.0
+    compared = 0
+    for adc_t in range(0, 1 << 20, step):
+        for adc_p in range(0, 1 << 20, step):
+            t_ref, p_ref = bmp._compensate(adc_t, adc_p)
+            if not (TEMP_RANGE[0] <= t_ref <= TEMP_RANGE[1] and PRESS_RANGE[0] <= p_ref <= PRESS_RANGE[1]):
+                continue
+            t, p = bmp._compensate_float(adc_t, adc_p)
+            worst_t = max(worst_t, abs(t - t_ref))
+            worst_p = max(worst_p, abs(p - p_ref))
+            compared += 1
+    ok = worst_t <= TEMP_TOL and worst_p <= PRESS_TOL
+    print("bmp280 agreement: {} samples, max dT={:.4f} degC, max dP={:.3f} Pa -> {}".format(
+        compared, worst_t, worst_p, "ok" if ok else "FAIL"))
+    return ok
+
+
+def per_sample(label, fn, *args):
+    meter.start()
+    for _ in range(SAMPLES):
+        fn(*args)
+    alloc = meter.stop()
+    print("{:<36} alloc/sample={}".format(label, alloc // SAMPLES))
+
+
+def run():
+    from ahtx0 import AHT20
+    from bmp280 import BMP280, MODE_FORCED
+
+    i2c = I2C(0)
+    bmp = BMP280(i2c)
+    ok = check_agreement(bmp)
+
+    adc_t, adc_p = bmp._read_raw_data()
+    per_sample("bmp280._compensate (integer)", bmp._compensate, adc_t, adc_p)
+    per_sample("bmp280._compensate_float", bmp._compensate_float, adc_t, adc_p)
+
+    bmp.configure(mode=MODE_FORCED)
+    start = i2c.transactions
+    bmp.read()
+    print("{:<36} i2c={}".format("bmp280.read (forced)", i2c.transactions - start))
+
+    aht = AHT20(i2c)
+    start = i2c.transactions
+    aht.measure()
+    print("{:<36} i2c={}".format("aht20.measure", i2c.transactions - start))
+
+    import os
+    from devices import DeviceRegistry
+    path = "i2c_devices.bench.json"
+    for label in ("registry.detect (cold)", "registry.detect (warm)"):
+        registry = DeviceRegistry(i2c, path)
+        start = i2c.transactions
+        registry.detect()
+        probe = BMP280(i2c, registry.address("bmp280"), calibration=registry.calibration("bmp280"))
+        AHT20(i2c, reset=not registry.warm)
+        registry.set_calibration("bmp280", probe.calibration)
+        registry.save()
+        print("{:<36} i2c={} warm={}".format(label, i2c.transactions - start, registry.warm))
+    os.remove(path)
+
+    import filters
+    pipeline = filters.Pipeline({
+        "temperature": [filters.Calibrate(-0.4), filters.Median(5), filters.EMA(0.3)],
+        "humidity": [filters.Median(5)],
+        "pressure": [filters.Outlier(300)],
+    })
+    record = {"temperature": 22.5, "humidity": 45.0, "pressure": 100653.0}
+    per_sample("filters.apply", pipeline.apply, record)
+
+    from sensors import AHT20Sensor, BMP280Sensor, SensorScheduler
+    sched = SensorScheduler([AHT20Sensor(aht), BMP280Sensor(bmp)])
+    start = i2c.transactions
+    sched.read()
+    print("{:<36} i2c={} cycle_ms={}".format("sensors.read", i2c.transactions - start, sched.last_cycle_ms))
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,29 @@
+# benchutil.py - shared helpers for the benchmarks in this directory
+import gc
+
+
+class AllocMeter:
+    # Bytes allocated by a call: gc.mem_alloc() on MicroPython, tracemalloc
+    # on CPython
+    def __init__(self):
+        self._tracemalloc = None
+        if not hasattr(gc, "mem_alloc"):
+            import tracemalloc
+            self._tracemalloc = tracemalloc
+            tracemalloc.start()
+
+    def start(self):
+        gc.collect()
+        if self._tracemalloc:
+            self._tracemalloc.reset_peak()
+            self._base = self._tracemalloc.get_traced_memory()[0]
+        else:
+            gc.disable()
+            self._base = gc.mem_alloc()
+
+    def stop(self):
+        if self._tracemalloc:
+            return self._tracemalloc.get_traced_memory()[1] - self._base
+        used = gc.mem_alloc() - self._base
+        gc.enable()
+        return used
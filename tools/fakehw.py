@@ -0,0 +1,186 @@
+# fakehw.py - instrumented stand-ins for machine.SPI/Pin/I2C
+#
+# Used by the benchmarks to run the real drivers without hardware. The I2C
+# stand-in answers like an AHT20 at 0x38 and a BMP280 at 0x76, using the
+# BMP280 datasheet's example calibration.
+import struct
+import sys
+
+
+class Counters:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.transactions = 0
+        self.bytes = 0
+        self.cs_toggles = 0
+
+    def snapshot(self):
+        return self.transactions, self.bytes, self.cs_toggles
+
+
+counters = Counters()
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 2
+    IRQ_RISING = 1
+
+    def __init__(self, id=None, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = 1 if value is None else value
+        self.handler = None
+        self.chip_select = False
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if value is not None:
+            self._value = value
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        # A chip-select assertion is a high-to-low edge on a pin used as CS
+        if self.chip_select and self._value and not v:
+            counters.cs_toggles += 1
+        self._value = v
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=None, **kwargs):
+        self.handler = handler
+
+
+class SPI:
+    def __init__(self, id=None, *args, **kwargs):
+        self.id = id
+
+    def write(self, buf):
+        counters.transactions += 1
+        counters.bytes += len(buf)
+
+
+def _crc8(data):
+    crc = 0xFF
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x31) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+class FakeAHT20:
+    def __init__(self, temperature=22.5, humidity=45.0):
+        self.temperature = temperature
+        self.humidity = humidity
+        self.conversions = 0
+
+    def write(self, buf):
+        if bytes(buf[:1]) == b"\xAC":
+            self.conversions += 1
+
+    def read(self, n):
+        hum = int(self.humidity / 100 * (1 << 20))
+        temp = int((self.temperature + 50) / 200 * (1 << 20))
+        frame = bytes((
+            0x1C,
+            (hum >> 12) & 0xFF,
+            (hum >> 4) & 0xFF,
+            ((hum & 0x0F) << 4) | ((temp >> 16) & 0x0F),
+            (temp >> 8) & 0xFF,
+            temp & 0xFF,
+        ))
+        return (frame + bytes((_crc8(frame),)))[:n]
+
+
+class FakeBMP280:
+    # Datasheet section 3.12 example: 25.08 degC, 100653.27 Pa
+    CALIB = struct.pack("<HhhHhhhhhhhh", 27504, 26435, -1000, 36477, -10685,
+                        3024, 2855, 140, -7, 15500, -14600, 6000)
+
+    def __init__(self, adc_t=519888, adc_p=415148):
+        self.adc_t = adc_t
+        self.adc_p = adc_p
+        self.regs = bytearray(256)
+        self.regs[0xD0] = 0x58
+        self.regs[0x88:0x88 + 24] = self.CALIB
+
+    def read_mem(self, reg, n):
+        if reg == 0xF7:
+            p, t = self.adc_p, self.adc_t
+            self.regs[0xF7:0xFD] = bytes((p >> 12, (p >> 4) & 0xFF, (p & 0x0F) << 4,
+                                          t >> 12, (t >> 4) & 0xFF, (t & 0x0F) << 4))
+        return bytes(self.regs[reg:reg + n])
+
+    def write_mem(self, reg, buf):
+        self.regs[reg:reg + len(buf)] = buf
+
+
+class I2C:
+    def __init__(self, id=None, *args, **kwargs):
+        self.id = id
+        self.devices = {0x38: FakeAHT20(), 0x76: FakeBMP280()}
+        self.transactions = 0
+
+    def _dev(self, addr):
+        self.transactions += 1
+        dev = self.devices.get(addr)
+        if dev is None:
+            raise OSError(19)  # ENODEV
+        return dev
+
+    def scan(self):
+        # A real scan addresses every non-reserved 7-bit address
+        self.transactions += 0x78 - 0x08
+        return sorted(self.devices)
+
+    def writeto(self, addr, buf, stop=True):
+        dev = self._dev(addr)
+        if hasattr(dev, "write"):
+            dev.write(buf)
+        return len(buf)
+
+    def readfrom(self, addr, n, stop=True):
+        return self._dev(addr).read(n)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        data = self._dev(addr).read(len(buf))
+        buf[:len(data)] = data
+
+    def readfrom_mem(self, addr, reg, n, addrsize=8):
+        return self._dev(addr).read_mem(reg, n)
+
+    def readfrom_mem_into(self, addr, reg, buf, addrsize=8):
+        data = self._dev(addr).read_mem(reg, len(buf))
+        buf[:len(data)] = data
+
+    def writeto_mem(self, addr, reg, buf, addrsize=8):
+        self._dev(addr).write_mem(reg, buf)
+
+
+class Timer:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def init(self, *args, **kwargs):
+        pass
+
+    def deinit(self):
+        pass
+
+
+def install():
+    # Register this module as `machine` so the drivers import the fakes
+    sys.modules["machine"] = sys.modules[__name__]
@@ -0,0 +1,31 @@
+# raw2rle.py - convert flat RGB565 .raw images to the rle565 format
+#
+#   python tools/raw2rle.py bg.raw bg.rle [width height]
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rle565 import encode  # noqa: E402
+
+
+def main(argv):
+    if len(argv) not in (3, 5):
+        print("usage: raw2rle.py in.raw out.rle [width height]")
+        return 1
+    src, dst = argv[1], argv[2]
+    width, height = (int(argv[3]), int(argv[4])) if len(argv) == 5 else (128, 128)
+    with open(src, "rb") as f:
+        data = f.read()
+    if len(data) != width * height * 2:
+        print("{}: expected {} bytes for {}x{}, got {}".format(src, width * height * 2, width, height, len(data)))
+        return 1
+    out = encode(data, width, height)
+    with open(dst, "wb") as f:
+        f.write(out)
+    print("{} -> {}: {} -> {} bytes".format(src, dst, len(data), len(out)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
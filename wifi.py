@@ -0,0 +1,265 @@
+# wifi.py - Wi-Fi connection as a background uasyncio task
+#
+# Replaces the blocking connect in boot.py, so the display and sensors start
+# at once whatever the network is doing. States:
+#   CONNECTING  station connect in progress, polled without blocking
+#   UP          link up; checked every LINK_CHECK_MS for loss
+#   BACKOFF     waiting before the next attempt, doubling up to BACKOFF_MAX
+# With no saved network, or once FALLBACK_AFTER attempts in a row failed,
+# the config access point is started and the station keeps retrying behind
+# it, except while a client is connected to the AP; the AP is shut down
+# again when the station link comes up.
+# on_change(ip) is called with the address to serve on, or None when no
+# interface is up.
+#
+# A connect first tries the link cached in wifi_config (known BSSID and
+# channel, and the saved lease instead of DHCP when reuse is enabled and it
+# is fresh) with a short timeout, then falls back to a full scan-and-DHCP
+# connect and drops the stale cache. A reused lease is only kept if the
+# gateway answers on it. After a full connect the AP is looked up once to
+# refresh the cache; that scan blocks the loop for a couple of seconds (see
+# _find_ap), so it is kept to the connect after a cache miss.
+import binascii
+import errno
+import time
+
+import network
+import uasyncio
+
+import wifi_config
+from wifi_config import load_config, HOSTNAME
+
+AP_SSID = "TempSensor"
+AP_PASSWORD = "password"  # At least 8 characters
+
+CONNECT_TIMEOUT_MS = 15000
+FAST_TIMEOUT_MS = 4000  # connect to the cached AP, else it is stale
+GATEWAY_TIMEOUT_MS = 1000  # gateway must answer on a reused lease
+GATEWAY_PORT = 53  # any reply counts, a refused connect included
+POLL_MS = 250
+LINK_CHECK_MS = 2000
+BACKOFF_MIN = 2  # seconds
+BACKOFF_MAX = 300
+FALLBACK_AFTER = 2  # failed attempts before the config AP comes up
+
+CONNECTING = "connecting"
+UP = "up"
+BACKOFF = "backoff"
+
+
+class WiFi:
+    def __init__(self, on_change=None):
+        self.on_change = on_change
+        self.state = BACKOFF
+        self.ip = None
+        self.sta = network.WLAN(network.STA_IF)
+        self.ap = network.WLAN(network.AP_IF)
+        self._retry_at = time.ticks_ms()
+        self._fast = False  # connected through the cached link
+        self._static = False  # connected with the saved lease, no DHCP
+        self._cfg = None
+
+    def busy(self):
+        # True while the radio needs the loop running: connecting, link up
+        # or serving the config AP
+        return self.state != BACKOFF or self.ap.active()
+
+    def ms_until_retry(self):
+        if self.state != BACKOFF:
+            return 0
+        return max(0, time.ticks_diff(self._retry_at, time.ticks_ms()))
+
+    def clock_set(self):
+        # Call once NTP has set the clock: dates a lease obtained before
+        # that, which was saved undated
+        cfg = self._cfg
+        if cfg and not self._static and self.sta.isconnected():
+            try:
+                wifi_config.stamp_lease(cfg)
+            except OSError as e:
+                print("Wi-Fi config write error:", e)
+
+    def on_ap(self, ip):
+        # True if ip is a client of the config AP (same subnet while it runs)
+        if not self.ap.active():
+            return False
+        own, mask = self.ap.ifconfig()[:2]
+        try:
+            a = [int(x) for x in ip.split(".")]
+            b = [int(x) for x in own.split(".")]
+            m = [int(x) for x in mask.split(".")]
+        except ValueError:
+            return False
+        return all(a[i] & m[i] == b[i] & m[i] for i in range(4))
+
+    def _set_ip(self, ip):
+        if ip != self.ip:
+            self.ip = ip
+            if self.on_change:
+                try:
+                    self.on_change(ip)
+                except Exception as e:
+                    print("Network handler error:", e)
+
+    def _start_ap(self):
+        if self.ap.active():
+            return
+        self.ap.active(True)
+        self.ap.config(essid=AP_SSID, password=AP_PASSWORD, authmode=network.AUTH_WPA_WPA2_PSK)
+        print("Started AP mode:", AP_SSID)
+        print("AP IP address:", self.ap.ifconfig()[0])
+        self._set_ip(self.ap.ifconfig()[0])
+
+    def _stop_ap(self):
+        if self.ap.active():
+            self.ap.active(False)
+            print("AP stopped.")
+
+    def _begin(self, cfg, link):
+        # Start a station connect, to the cached AP when link is given;
+        # does not wait for the link
+        sta = self.sta
+        sta.active(True)
+        sta.disconnect()  # Clear previous state
+        sta.config(pm=0)  # Disable power save
+        sta.config(dhcp_hostname=HOSTNAME)
+        lease = wifi_config.lease(cfg) if link else None
+        try:
+            sta.ifconfig(lease or "dhcp")
+        except Exception as e:
+            print("ifconfig error:", e)
+            lease = None
+        self._static = lease is not None
+        print("Connecting to SSID:", cfg["ssid"], "(cached AP)" if link else "")
+        if link:
+            try:
+                sta.config(channel=link["channel"])
+            except Exception:
+                pass  # not settable on this firmware; the BSSID still skips the scan
+            sta.connect(cfg["ssid"], cfg["password"], bssid=binascii.unhexlify(link["bssid"]))
+        else:
+            sta.connect(cfg["ssid"], cfg["password"])
+
+    async def _attempt(self, cfg, link, timeout_ms):
+        # True once the link is up, False on error or timeout
+        try:
+            self._begin(cfg, link)
+        except Exception as e:
+            print("Connect error:", e)
+            self.sta.active(False)
+            return False
+        started = time.ticks_ms()
+        while not self.sta.isconnected():
+            if time.ticks_diff(time.ticks_ms(), started) > timeout_ms:
+                print("Wi-Fi connection timeout.")
+                self.sta.disconnect()
+                return False
+            await uasyncio.sleep_ms(POLL_MS)
+        return True
+
+    async def _connect(self, cfg):
+        self.state = CONNECTING
+        link = cfg.get("link")
+        self._fast = False
+        if link:
+            if await self._attempt(cfg, link, FAST_TIMEOUT_MS):
+                if not self._static or await self._gateway_ok():
+                    self._fast = True
+                    return True
+                print("Saved lease not answering, using DHCP.")
+            print("Cached Wi-Fi link is stale.")
+            wifi_config.clear_link(cfg)
+        return await self._attempt(cfg, None, CONNECT_TIMEOUT_MS)
+
+    async def _gateway_ok(self):
+        # True if the gateway of the static config answers a TCP connect,
+        # accepted or refused; a wrong address or subnet gets no reply
+        gateway = self.sta.ifconfig()[2]
+        try:
+            reader, writer = await uasyncio.wait_for_ms(
+                uasyncio.open_connection(gateway, GATEWAY_PORT), GATEWAY_TIMEOUT_MS)
+            writer.close()
+            await writer.wait_closed()
+            return True
+        except OSError as e:
+            return bool(e.args) and e.args[0] == errno.ECONNREFUSED
+        except uasyncio.TimeoutError:
+            return False
+
+    def _remember(self, cfg):
+        # Save the AP and lease for the next connect
+        if self._fast:
+            link = cfg["link"]
+            bssid, channel = link["bssid"], link["channel"]
+        else:
+            bssid, channel = self._find_ap(cfg["ssid"])
+            if bssid is None:
+                return
+        try:
+            wifi_config.save_link(cfg, bssid, channel, self.sta.ifconfig(), dhcp=not self._static)
+        except OSError as e:
+            print("Wi-Fi config write error:", e)
+
+    def _find_ap(self, ssid):
+        # (BSSID hex, channel) of the strongest AP for ssid on our channel.
+        # Known stall: sta.scan() blocks the whole event loop for a couple of
+        # seconds (display, buttons and sensors pause), and there is no
+        # async scan. It only runs after a full connect, i.e. on first boot
+        # or once the cache was found stale; reconnects through the cache
+        # never scan.
+        try:
+            current = self.sta.config("channel")
+        except Exception:
+            current = None
+        best = None
+        try:
+            for net in self.sta.scan():
+                if net[0].decode() != ssid or (current and net[2] != current):
+                    continue
+                if best is None or net[3] > best[3]:
+                    best = net
+        except Exception as e:
+            print("Wi-Fi scan error:", e)
+        if best is None:
+            return None, None
+        return binascii.hexlify(best[1]).decode(), best[2]
+
+    async def run(self):
+        cfg = self._cfg = load_config()
+        if not (cfg and "ssid" in cfg and "password" in cfg):
+            print("No Wi-Fi config found.")
+            self.sta.active(False)
+            self._start_ap()
+            return
+        failures = 0
+        backoff = BACKOFF_MIN
+        while True:
+            if await self._connect(cfg):
+                failures = 0
+                backoff = BACKOFF_MIN
+                self.state = UP
+                self._stop_ap()
+                self._set_ip(self.sta.ifconfig()[0])
+                print("Connected. IP:", self.ip)
+                self._remember(cfg)
+                while self.sta.isconnected():
+                    await uasyncio.sleep_ms(LINK_CHECK_MS)
+                print("Wi-Fi link lost.")
+                self._set_ip(None)
+                continue  # reconnect straight away once
+            failures += 1
+            if failures >= FALLBACK_AFTER:
+                self._start_ap()
+            self.state = BACKOFF
+            self._retry_at = time.ticks_add(time.ticks_ms(), backoff * 1000)
+            print("Wi-Fi retry in {} s".format(backoff))
+            await uasyncio.sleep(backoff)
+            backoff = min(backoff * 2, BACKOFF_MAX)
+            # The station and the AP share one radio, and a connect attempt
+            # takes the AP off its channel: hold retries while a phone or
+            # laptop is on the config AP
+            if self.ap.active() and self.ap.isconnected():
+                print("Config AP in use, Wi-Fi retries paused.")
+                while self.ap.active() and self.ap.isconnected():
+                    self._retry_at = time.ticks_add(time.ticks_ms(), LINK_CHECK_MS)
+                    await uasyncio.sleep_ms(LINK_CHECK_MS)
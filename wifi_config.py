@@ -1,5 +1,18 @@
+import time
 import ujson
 
+HOSTNAME = "temp-sensor"
+
+# A saved DHCP lease is only reused for this long after it was obtained
+LEASE_MAX_AGE = 12 * 3600  # seconds
+
+# After a power cycle the RTC restarts at 2000 until NTP sets it; a lease
+# is only dated, and its age only trusted, once the clock reads this year
+CLOCK_VALID_YEAR = 2024
+
+def clock_set():
+    return time.localtime()[0] >= CLOCK_VALID_YEAR
+
 def load_config():
     try:
         with open("wifi_config.json") as f:
@@ -7,6 +20,57 @@ def load_config():
     except:
         return {}
 
-def save_config(ssid, password):
+def _write(cfg):
     with open("wifi_config.json", "w") as f:
-        ujson.dump({"ssid": ssid, "password": password}, f)
+        ujson.dump(cfg, f)
+
+def save_config(ssid, password):
+    # New credentials drop any cached link details
+    _write({"ssid": ssid, "password": password})
+
+# === Cached link ===
+# After a successful connect the access point's BSSID and channel and the
+# DHCP lease are kept next to the credentials, so the next connect can go
+# straight to that AP and skip the scan. With "reuse_lease": true in the
+# config the lease is reused too and DHCP skipped; that is off by default,
+# since a lease the router has since handed to another host would clash.
+
+def save_link(cfg, bssid, channel, ifconfig, dhcp=True):
+    # Record the link in cfg; dhcp means the lease was just obtained, which
+    # restarts its age. With the clock unset it is left undated (0), so it
+    # is never reused unless stamp_lease() dates it later. Only touches
+    # flash when something changed.
+    link = {"bssid": bssid, "channel": channel, "ifconfig": list(ifconfig)}
+    old = cfg.get("link")
+    if old and not dhcp and all(old.get(k) == v for k, v in link.items()):
+        return
+    if dhcp or not old:
+        link["leased"] = time.time() if clock_set() else 0
+    else:
+        link["leased"] = old.get("leased", 0)
+    cfg["link"] = link
+    _write(cfg)
+
+def stamp_lease(cfg):
+    # Date an undated lease once the clock has been set
+    link = cfg.get("link")
+    if link and not link.get("leased") and clock_set():
+        link["leased"] = time.time()
+        _write(cfg)
+
+def clear_link(cfg):
+    if cfg.pop("link", None) is not None:
+        _write(cfg)
+
+def lease(cfg):
+    # Saved (ip, mask, gateway, dns) if reuse is enabled and it is known to
+    # be fresh
+    link = cfg.get("link")
+    if not link or not cfg.get("reuse_lease", False):
+        return None
+    if not link.get("leased") or not clock_set():
+        return None
+    age = time.time() - link["leased"]
+    if not 0 <= age <= LEASE_MAX_AGE:
+        return None
+    return tuple(link["ifconfig"])
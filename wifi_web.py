@@ -1,16 +1,17 @@
-import socket
+import uasyncio
+import ujson
 from wifi_config import save_config
 
-def start_config_server():
-    html = """\
+HTML = """\
 HTTP/1.0 200 OK
+Content-Type: text/html
 
 <!DOCTYPE html>
 <html>
   <head><title>Wi-Fi Setup</title></head>
   <body>
     <h2>Configure Wi-Fi</h2>
-    <form method="GET">
+    <form method="POST">
       SSID: <input name="ssid"><br>
       Password: <input name="password" type="password"><br>
       <input type="submit">
@@ -19,29 +20,91 @@ HTTP/1.0 200 OK
 </html>
 """
 
-    s = socket.socket()
-    s.bind(('', 80))
-    s.listen(1)
-    print("Web server started on port 80")
-
-    while True:
-        conn, addr = s.accept()
-        print("Client connected from", addr)
-        req = conn.recv(1024).decode()
-        if "ssid=" in req:
-            try:
-                ssid = req.split("ssid=")[1].split("&")[0]
-                password = req.split("password=")[1].split(" ")[0]
-                ssid = ssid.replace('+', ' ')
-                password = password.replace('+', ' ')
-                save_config(ssid, password)
-                conn.send("HTTP/1.0 200 OK\r\n\r\nSaved. Rebooting...")
-                conn.close()
-                time.sleep(2)
-                import machine
-                machine.reset()
-            except:
-                pass
-        else:
-            conn.sendall(html)
-        conn.close()
+FORBIDDEN = b"HTTP/1.0 403 Forbidden\r\n\r\nWi-Fi setup is only available on the TempSensor access point."
+
+# Largest form body read for a credentials POST
+_MAX_BODY = 512
+
+
+def _unquote(s):
+    # Decode a form-encoded query value
+    s = s.replace("+", " ")
+    if "%" not in s:
+        return s
+    parts = s.split("%")
+    out = bytearray(parts[0].encode())
+    for part in parts[1:]:
+        try:
+            out.append(int(part[:2], 16))
+            out.extend(part[2:].encode())
+        except ValueError:
+            out.extend(("%" + part).encode())
+    return out.decode()
+
+
+def _form(body):
+    params = {}
+    for pair in body.split("&"):
+        if "=" in pair:
+            k, v = pair.split("=", 1)
+            params[k] = _unquote(v)
+    return params
+
+
+async def _reboot():
+    await uasyncio.sleep(2)
+    import machine
+    machine.reset()
+
+
+def _handler(data, setup_allowed):
+    async def handle(reader, writer):
+        try:
+            line = await reader.readline()
+            length = 0
+            while True:
+                header = await reader.readline()
+                if not header or header == b"\r\n":
+                    break
+                if header.lower().startswith(b"content-length:"):
+                    length = int(header[15:].strip())
+            parts = line.decode().split(" ")
+            method = parts[0]
+            path = parts[1] if len(parts) > 1 else "/"
+            # Only clients of the config AP may see the form or change the
+            # credentials, and only with a POST, so no station-side host or
+            # cross-site GET (e.g. an <img src>) can reconfigure the device
+            peer = writer.get_extra_info("peername")[0]
+            allowed = setup_allowed is not None and setup_allowed(peer)
+            if path.startswith("/data") and data is not None:
+                writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n\r\n")
+                writer.write(ujson.dumps(data()).encode())
+            elif not allowed:
+                writer.write(FORBIDDEN)
+            elif method == "POST":
+                params = _form((await reader.read(min(length, _MAX_BODY))).decode())
+                if params.get("ssid"):
+                    save_config(params["ssid"], params.get("password", ""))
+                    writer.write(b"HTTP/1.0 200 OK\r\n\r\nSaved. Rebooting...")
+                    uasyncio.create_task(_reboot())
+                else:
+                    writer.write(HTML.encode())
+            else:
+                writer.write(HTML.encode())
+            await writer.drain()
+        except Exception as e:
+            print("Web request error:", e)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+    return handle
+
+
+async def serve(port=80, data=None, setup_allowed=None):
+    # Config form on / for clients where setup_allowed(peer_ip) is true, and
+    # the latest readings as JSON on /data when a `data` callable is given.
+    # The server runs in the background and each client gets its own task,
+    # so a slow client never blocks the others.
+    server = await uasyncio.start_server(_handler(data, setup_allowed), "0.0.0.0", port)
+    print("Web server started on port", port)
+    return server